@@ -0,0 +1,94 @@
+import random
+import time
+
+from googleapiclient.errors import HttpError
+
+from gmail_batch import is_retryable
+from sqlite_store import SqliteStore
+
+OUTBOX_FILE = "outbox.db"
+MAX_ATTEMPTS = 6
+RETRY_BASE = 60
+
+
+def is_quota_error(exc) -> bool:
+    return isinstance(exc, HttpError) and int(exc.resp.status) in (403, 429) and is_retryable(exc)
+
+
+class AckOutbox(SqliteStore):
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS outbox (
+        msg_id TEXT PRIMARY KEY,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        reported INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+    """
+
+    def __init__(self, path=OUTBOX_FILE):
+        super().__init__(path)
+
+    def enqueue(self, msg_id, recipient, subject, body):
+        self.execute(
+            "INSERT OR IGNORE INTO outbox (msg_id, recipient, subject, body) VALUES (?, ?, ?, ?)",
+            (msg_id, recipient, subject, body),
+        )
+
+    def due(self, limit=100):
+        return self.query(
+            "SELECT msg_id, recipient, subject, body, attempts FROM outbox"
+            " WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+            (time.time(), limit),
+        )
+
+    def mark_sent(self, msg_id):
+        self.execute(
+            "UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL,"
+            " reported = 0 WHERE msg_id = ?", (msg_id,)
+        )
+
+    def mark_retry(self, msg_id, error, delay):
+        self.execute(
+            "UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ?"
+            " WHERE msg_id = ?", (time.time() + delay, str(error), msg_id)
+        )
+
+    def mark_failed(self, msg_id, error):
+        self.execute(
+            "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ?,"
+            " reported = 0 WHERE msg_id = ?", (str(error), msg_id)
+        )
+
+    def unreported(self):
+        return self.query("SELECT msg_id, status FROM outbox WHERE status != 'pending' AND reported = 0")
+
+    def mark_reported(self, msg_ids):
+        with self.transaction() as db:
+            db.executemany("UPDATE outbox SET reported = 1 WHERE msg_id = ?", [(m,) for m in msg_ids])
+
+
+def drain(outbox, send, bucket, limit=100) -> int:
+    sent = 0
+    for msg_id, recipient, subject, body, attempts in outbox.due(limit):
+        bucket.acquire()
+        try:
+            send(recipient, subject, body)
+        except Exception as e:
+            if attempts + 1 >= MAX_ATTEMPTS or not (is_retryable(e) or isinstance(e, OSError)):
+                outbox.mark_failed(msg_id, e)
+                continue
+            delay = RETRY_BASE * 2 ** attempts
+            outbox.mark_retry(msg_id, e, delay + random.uniform(0, delay / 2))
+            if is_quota_error(e):
+                # The whole mailbox is throttled; everything else would fail too.
+                break
+            continue
+        outbox.mark_sent(msg_id)
+        sent += 1
+    return sent
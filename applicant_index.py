@@ -0,0 +1,98 @@
+import re
+import time
+
+from sqlite_store import SqliteStore
+
+INDEX_FILE = "applicants.db"
+FIRST_DATA_ROW = 2
+
+
+def normalize_phone(phone: str) -> str:
+    phone = (phone or '').strip().lstrip("'")
+    digits = re.sub(r'\D', '', phone)
+    return f"+{digits}" if phone.startswith('+') and digits else digits
+
+
+def name_email_key(name: str, email: str) -> str:
+    name, email = (name or '').strip().lower(), (email or '').strip().lower()
+    return f"{name}\t{email}" if name and email else ''
+
+
+class ApplicantIndex(SqliteStore):
+    # Local mirror of the dedup columns of the Applicants tab, keyed by sheet
+    # row number so it can be checked against the sheet cheaply.
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS applicants (
+        row INTEGER PRIMARY KEY,
+        msg_id TEXT NOT NULL,
+        name_email TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        link TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS applicants_msg_id ON applicants (msg_id);
+    CREATE INDEX IF NOT EXISTS applicants_name_email ON applicants (name_email);
+    CREATE INDEX IF NOT EXISTS applicants_phone ON applicants (phone);
+    CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        super().__init__(path)
+
+    @staticmethod
+    def _entry(row_number, row):
+        cell = lambda i: row[i] if len(row) > i else ''
+        return (
+            row_number, cell(0), name_email_key(cell(5), cell(6)),
+            normalize_phone(cell(7)), cell(4),
+        )
+
+    def seen_ids(self, msg_ids) -> set:
+        seen = set()
+        msg_ids = list(msg_ids)
+        for start in range(0, len(msg_ids), 500):
+            chunk = msg_ids[start:start + 500]
+            marks = ','.join('?' * len(chunk))
+            seen.update(r[0] for r in self.query(
+                f"SELECT msg_id FROM applicants WHERE msg_id IN ({marks})", chunk
+            ))
+        return seen
+
+    def is_duplicate(self, name, email, phone) -> bool:
+        key, phone = name_email_key(name, email), normalize_phone(phone)
+        return bool(self.query(
+            "SELECT 1 FROM applicants WHERE (name_email = ? AND ? != '')"
+            " OR (phone = ? AND ? != '') LIMIT 1", (key, key, phone, phone)
+        ))
+
+    def add_rows(self, rows, first_row):
+        with self.transaction() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO applicants VALUES (?, ?, ?, ?, ?)",
+                [self._entry(first_row + i, row) for i, row in enumerate(rows)],
+            )
+
+    def rebuild(self, values):
+        with self.transaction() as db:
+            db.execute("DELETE FROM applicants")
+            db.executemany(
+                "INSERT INTO applicants VALUES (?, ?, ?, ?, ?)",
+                [self._entry(FIRST_DATA_ROW + i, row) for i, row in enumerate(values)],
+            )
+        self.mark_reconciled()
+
+    def last_row(self):
+        rows = self.query("SELECT row, msg_id FROM applicants ORDER BY row DESC LIMIT 1")
+        return rows[0] if rows else (FIRST_DATA_ROW - 1, '')
+
+    def row_of(self, msg_id):
+        rows = self.query("SELECT row FROM applicants WHERE msg_id = ?", (msg_id,))
+        return rows[0][0] if rows else None
+
+    def mark_reconciled(self):
+        self.execute(
+            "INSERT OR REPLACE INTO index_meta VALUES ('reconciled_at', ?)", (str(time.time()),)
+        )
+
+    def reconciled_within(self, seconds) -> bool:
+        rows = self.query("SELECT value FROM index_meta WHERE key = 'reconciled_at'")
+        return bool(rows) and time.time() - float(rows[0][0]) < seconds
@@ -0,0 +1,58 @@
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKFILL_FILE = "backfill_state.json"
+DAY = 24 * 3600
+
+
+def parse_date(value) -> int:
+    # YYYY-MM-DD (UTC) to epoch seconds, the form Gmail's after:/before: take.
+    return int(datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+def windows(after=None, before=None, window_days=None):
+    # Yields (start, end) epoch ranges, oldest first, covering [after, before).
+    # Without ``window_days`` (or without ``after``) the range is one window.
+    before = before or int(time.time()) + DAY
+    if not window_days or not after:
+        yield after, before
+        return
+    start = after
+    while start < before:
+        end = min(before, start + window_days * DAY)
+        yield start, end
+        start = end
+
+
+def window_query(query, start, end) -> str:
+    if start:
+        query += f" after:{start}"
+    if end:
+        query += f" before:{end}"
+    return query
+
+
+def load_state(path=BACKFILL_FILE):
+    p = Path(path)
+    if not p.exists():
+        return None
+    return json.loads(p.read_text())
+
+
+def save_state(state, path=BACKFILL_FILE):
+    # Write-then-rename so an interrupted run never leaves half a checkpoint.
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(json.dumps(state))
+    tmp.replace(path)
+
+
+def resume_point(state, plan):
+    # ``plan`` identifies the backfill (query and range). A saved state for the
+    # same plan gives the start of the window it stopped in and the token of
+    # the next page there (None once that window is finished); anything else
+    # starts over.
+    if not state or state.get('plan') != plan:
+        return None, None
+    return state.get('start'), state.get('pageToken')
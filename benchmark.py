@@ -0,0 +1,321 @@
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from fake_google import FakeClients, FakeDrive, FakeGmail, FakeSheets
+from metrics import Metrics
+
+# Offline benchmark of the ingest pipeline: a generated corpus of PDF/DOCX
+# resumes is delivered to in-process fakes of Gmail, Drive and Sheets, and
+# the bot's hot functions and a full run_once cycle are timed against them.
+#
+#   python benchmark.py --messages 200 --latency 0.05 --json bench.json
+
+FIRST_NAMES = ["Arben", "Drita", "Maria", "John", "Aisha", "Chen", "Lena", "Omar", "Sofia", "Luca"]
+LAST_NAMES = ["Krasniqi", "Berisha", "Smith", "Garcia", "Khan", "Wang", "Muller", "Rossi", "Novak", "Silva"]
+CITIES = ["Prishtina", "Berlin", "London", "Madrid", "Vienna", "Tirana"]
+TITLES = ["Software Engineer", "Data Analyst", "Marketing Manager", "Product Manager",
+          "HR Specialist", "Sales Representative"]
+SKILLS = ["Python", "Java", "SQL", "Excel", "Tableau", "React", "Node.js", "Kubernetes",
+          "Docker", "SEO", "CRM", "Scrum", "Power BI", "Negotiation", "Onboarding"]
+DEGREES = ["BSc Computer Science", "MSc Data Science", "BA Marketing", "MBA",
+           "BSc Economics", "MA Human Resources"]
+UNIVERSITIES = ["University of Prishtina", "TU Berlin", "University of Vienna", "UCL"]
+FILLER = ("delivered managed improved designed built led coordinated analysed "
+          "stakeholders customers pipeline reporting quarterly team projects "
+          "processes growth platform migration budget results").split()
+
+
+def resume_lines(rng, pages):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    email = f"{first}.{last}{rng.randint(1, 999)}@example.com".lower()
+    phone = f"+383 4{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(100, 999)}"
+    title = rng.choice(TITLES)
+    year = rng.randint(2005, 2020)
+    lines = [f"{first} {last}", f"{email} | {phone} | {rng.choice(CITIES)}", "",
+             "Summary", f"{title} with {rng.randint(1, 15)} years of experience.", "",
+             "Experience"]
+    for i in range(3):
+        lines.append(f"{rng.choice(TITLES)} at Company {rng.randint(1, 99)} ({year + i}-{year + i + 1})")
+    lines += ["", "Skills", ", ".join(rng.sample(SKILLS, 6)), "", "Education"]
+    for i in range(2):
+        lines.append(f"{rng.choice(DEGREES)}, {rng.choice(UNIVERSITIES)}, {year - 4 + i * 2}")
+    while len(lines) < pages * 45:
+        lines.append(" ".join(rng.choice(FILLER) for _ in range(12)))
+    return {'first': first, 'last': last, 'email': email, 'title': title, 'lines': lines}
+
+
+def make_docx(lines) -> bytes:
+    paragraphs = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>' for line in lines
+    )
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>'
+        ))
+        z.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/'
+            '2006/relationships/officeDocument" Target="word/document.xml"/></Relationships>'
+        ))
+        z.writestr('word/document.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{paragraphs}</w:body></w:document>'
+        ))
+    return out.getvalue()
+
+
+def make_pdf(lines, lines_per_page=45) -> bytes:
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        text = " T* ".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj"
+            for line in page
+        )
+        stream = f"BT /F1 10 Tf 50 750 Td 14 TL {text} ET".encode('latin-1', 'replace')
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        body = body if isinstance(body, bytes) else body.encode()
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def make_corpus(n, seed=0, pages=2, pdf_ratio=0.5, duplicate_rate=0.1):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(n):
+        if messages and rng.random() < duplicate_rate:
+            # Same CV sent again for another posting.
+            message = dict(rng.choice(messages), id=f"m{i:06d}")
+        else:
+            person = resume_lines(rng, pages)
+            ext = '.pdf' if rng.random() < pdf_ratio else '.docx'
+            data = make_pdf(person['lines']) if ext == '.pdf' else make_docx(person['lines'])
+            message = {
+                'id': f"m{i:06d}",
+                'from': f"{person['first']} {person['last']} <{person['email']}>",
+                'subject': f"Application for {person['title']} - CV",
+                'body': f"Dear hiring team,\nplease find my resume attached.\n{person['first']}",
+                'filename': f"{person['first']}_{person['last']}_CV{ext}",
+                'data': data,
+                'text': "\n".join(person['lines']),
+            }
+        messages.append(message)
+    return messages
+
+
+def summarize(samples, units=None):
+    samples = sorted(samples)
+    if not samples:
+        return {'n': 0}
+    pick = lambda p: samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+    total = sum(samples)
+    return {
+        'n': len(samples),
+        'mean_ms': total / len(samples) * 1000,
+        'p50_ms': pick(50) * 1000,
+        'p95_ms': pick(95) * 1000,
+        'p99_ms': pick(99) * 1000,
+        'max_ms': samples[-1] * 1000,
+        'per_sec': (units or len(samples)) / total if total else float('inf'),
+    }
+
+
+def time_calls(fn, args_list):
+    samples = []
+    tracemalloc.start()
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = summarize(samples)
+    result['peak_mem_kb'] = peak / 1024
+    return result
+
+
+def bench_functions(bot, corpus, parse):
+    results = {}
+    unique = list({id(m['data']): m for m in corpus}.values())
+    if parse:
+        results['parse_resume'] = time_calls(bot.parse_resume, [(m['data'], m['filename']) for m in unique])
+    results['infer_job_title'] = time_calls(
+        bot.infer_job_title, [(m['subject'], m['body'], m['text']) for m in corpus]
+    )
+    results['extract_phone_number'] = time_calls(bot.extract_phone_number, [(m['text'],) for m in corpus])
+
+    from applicant_index import ApplicantIndex
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ApplicantIndex(Path(tmp) / "bench.db")
+        rows = [[m['id'], m['from'], m['subject'], '', '', m['from'].split(' <')[0],
+                 m['from'].split('<')[-1].rstrip('>'), f"+38344{i:06d}"] for i, m in enumerate(corpus * 10)]
+        index.rebuild(rows)
+        probes = [(r[5], r[6], r[7]) for r in random.Random(1).sample(rows, min(len(rows), 2000))]
+        results['dedup'] = time_calls(index.is_duplicate, probes)
+        index.close()
+    return results
+
+
+def reset_bot(bot):
+    bot.close_workers()
+    for name in ('_cache', '_index', '_journal', '_search', '_outbox'):
+        if getattr(bot, name) is not None:
+            getattr(bot, name).close()
+    for name in ('_engine', '_cache', '_index', '_journal', '_search', '_uploader', '_outbox'):
+        setattr(bot, name, None)
+
+
+def endpoint_stats(*apis):
+    stats = {}
+    for api in apis:
+        for endpoint, calls in api.calls.items():
+            stats[f"{type(api).__name__[4:].lower()}.{endpoint}"] = summarize(
+                [d for d, _ in calls], units=sum(u for _, u in calls)
+            )
+    return stats
+
+
+def bench_cycle(bot, corpus, latency, quota_error_rate, parse_workers):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            gmail = FakeGmail(latency=latency, quota_error_rate=quota_error_rate)
+            drive = FakeDrive(latency=latency, quota_error_rate=quota_error_rate)
+            sheets = FakeSheets(latency=latency, quota_error_rate=quota_error_rate)
+            bot.CLIENTS = FakeClients(gmail, drive, sheets)
+            bot.PARSE_WORKERS = parse_workers
+            bot.METRICS = Metrics()
+            reset_bot(bot)
+            # Deliver the corpus after a checkpoint, so the cycle takes the
+            # incremental path a running bot does rather than the bounded
+            # first-run resync.
+            bot.save_checkpoint({'historyId': str(gmail.history_id), 'syncedAt': int(time.time())})
+            for message in corpus:
+                gmail.deliver(message)
+
+            error = None
+            tracemalloc.start()
+            started = time.perf_counter()
+            try:
+                bot.run_once()
+            except Exception as e:
+                error = repr(e)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            listed = int(bot.METRICS.counters[('messages_listed_total', ())])
+
+            idle_started = time.perf_counter()
+            bot.run_once()
+            idle = time.perf_counter() - idle_started
+            reset_bot(bot)
+            return {
+                'messages': listed,
+                'error': error,
+                'rows_written': len(sheets.rows) - 1,
+                'files_uploaded': len(drive.stored),
+                'cycle_s': elapsed,
+                'messages_per_sec': listed / elapsed if elapsed else float('inf'),
+                'idle_cycle_ms': idle * 1000,
+                'peak_mem_kb': peak / 1024,
+                'api': endpoint_stats(gmail, drive, sheets),
+                'stages': bot.METRICS.snapshot(),
+            }
+        finally:
+            os.chdir(cwd)
+
+
+def print_table(title, results):
+    print(f"\n{title}")
+    print(f"  {'stage':<28}{'n':>7}{'mean ms':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'/sec':>10}")
+    for name, r in results.items():
+        if r.get('n'):
+            print(f"  {name:<28}{r['n']:>7}{r['mean_ms']:>10.2f}{r['p50_ms']:>9.2f}"
+                  f"{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['per_sec']:>10.1f}")
+
+
+def print_stages(snapshot):
+    print("\nrun_once stages (both cycles)")
+    print(f"  {'stage':<28}{'n':>7}{'total s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, r in snapshot['stages'].items():
+        print(f"  {name:<28}{r['count']:>7}{r['sum_s']:>10.2f}{r['p50_s'] * 1000:>9.1f}{r['p95_s'] * 1000:>9.1f}")
+    for name, value in sorted(snapshot['counters'].items()):
+        print(f"  {name:<60}{value:>8g}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmark of the CV ingest pipeline.')
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--pdf-ratio', type=float, default=0.5)
+    parser.add_argument('--duplicates', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per fake API call')
+    parser.add_argument('--quota-errors', type=float, default=0.0, help='rate-limit error probability')
+    parser.add_argument('--parse-workers', type=int, default=None)
+    parser.add_argument('--skip-parse', action='store_true', help='skip the parse_resume micro-benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the full report to this file')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import gmail_to_sheet_with_cv as bot
+
+    corpus = make_corpus(args.messages, args.seed, args.pages, args.pdf_ratio, args.duplicates)
+    report = {'config': vars(args)}
+    report['functions'] = bench_functions(bot, corpus, parse=not args.skip_parse)
+    print_table("Functions", report['functions'])
+    workers = args.parse_workers if args.parse_workers is not None else bot.PARSE_WORKERS
+    report['cycle'] = bench_cycle(bot, corpus, args.latency, args.quota_errors, workers)
+    cycle = report['cycle']
+    print_table("API calls during the cycle", cycle['api'])
+    print_stages(cycle['stages'])
+    print(f"\nFull cycle: {cycle['messages']} messages, {cycle['rows_written']} rows, "
+          f"{cycle['files_uploaded']} uploads in {cycle['cycle_s']:.2f}s "
+          f"({cycle['messages_per_sec']:.1f} msg/s), idle cycle {cycle['idle_cycle_ms']:.1f} ms, "
+          f"peak traced memory {cycle['peak_mem_kb'] / 1024:.1f} MiB")
+    if cycle['error']:
+        print(f"Cycle failed: {cycle['error']}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import math
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+from sqlite_store import SqliteStore
+
+# Local full-text index over the CV text of every processed application,
+# keyed by Gmail message id, so recruiters can rank candidates against a job
+# description without opening CVs one by one:
+#
+#   python candidate_search.py "kubernetes 5 years Berlin"
+#   python candidate_search.py --file job_description.txt --limit 50
+#
+# Postings live in a clustered (term, doc) table, so the posting list of a
+# term is one contiguous range of the file, and the file is memory-mapped so
+# repeated queries are served from the page cache. Scores are Okapi BM25.
+
+SEARCH_FILE = "candidates.db"
+MMAP_BYTES = 1024 * 1024 * 1024
+K1 = 1.2
+B = 0.75
+# A long job description is cut down to its rarest terms; very common terms
+# barely move BM25 scores but have the longest posting lists.
+MAX_QUERY_TERMS = 40
+
+TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*')
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i in into is it its
+me my of on or our she that the their them they this to was we were will with
+you your
+""".split())
+
+
+def tokenize(text: str) -> list:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class CandidateIndex(SqliteStore):
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS docs (
+        doc INTEGER PRIMARY KEY,
+        msg_id TEXT NOT NULL UNIQUE,
+        length INTEGER NOT NULL,
+        info TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS terms (
+        term TEXT PRIMARY KEY,
+        df INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS postings (
+        term TEXT NOT NULL,
+        doc INTEGER NOT NULL,
+        tf INTEGER NOT NULL,
+        PRIMARY KEY (term, doc)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+    """
+
+    def __init__(self, path=SEARCH_FILE, mmap_bytes=MMAP_BYTES):
+        super().__init__(path)
+        self.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+
+    def _remove(self, db, msg_id):
+        row = db.execute("SELECT doc FROM docs WHERE msg_id = ?", (msg_id,)).fetchone()
+        if row is None:
+            return
+        doc = row[0]
+        db.execute(
+            "UPDATE terms SET df = df - 1 WHERE term IN (SELECT term FROM postings WHERE doc = ?)",
+            (doc,),
+        )
+        db.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        db.execute("DELETE FROM docs WHERE doc = ?", (doc,))
+
+    def add(self, msg_id, text, **info):
+        # Indexes (or re-indexes) one CV. ``info`` (name, job, link, ...) is
+        # returned with search hits.
+        counts = Counter(tokenize(text))
+        with self.transaction() as db:
+            self._remove(db, msg_id)
+            doc = db.execute(
+                "INSERT INTO docs (msg_id, length, info) VALUES (?, ?, ?)",
+                (msg_id, sum(counts.values()), json.dumps(info)),
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                [(term, doc, tf) for term, tf in counts.items()],
+            )
+            db.executemany(
+                "INSERT INTO terms VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                [(term,) for term in counts],
+            )
+
+    def remove(self, msg_id):
+        with self.transaction() as db:
+            self._remove(db, msg_id)
+
+    def __len__(self):
+        return self.query("SELECT COUNT(*) FROM docs")[0][0]
+
+    def search(self, text, limit=20) -> list:
+        # Returns up to ``limit`` (msg_id, score, info) tuples, best first.
+        n, avg_length = self.query("SELECT COUNT(*), AVG(length) FROM docs")[0]
+        wanted = Counter(tokenize(text))
+        if not n or not wanted:
+            return []
+        marks = ','.join('?' * len(wanted))
+        df = dict(self.query(f"SELECT term, df FROM terms WHERE term IN ({marks}) AND df > 0",
+                             list(wanted)))
+        weights = {
+            term: wanted[term] * math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            for term in df
+        }
+        if not weights:
+            return []
+        terms = sorted(weights, key=lambda t: df[t])[:MAX_QUERY_TERMS]
+        values = ','.join('(?, ?)' for _ in terms)
+        params = [v for term in terms for v in (term, weights[term])]
+        rows = self.query(
+            f"WITH q(term, weight) AS (VALUES {values})"
+            " SELECT d.msg_id,"
+            "   SUM(q.weight * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * d.length / ?))) AS score,"
+            "   d.info"
+            " FROM q JOIN postings p ON p.term = q.term JOIN docs d ON d.doc = p.doc"
+            " GROUP BY p.doc ORDER BY score DESC LIMIT ?",
+            params + [K1, K1, B, B, avg_length or 1, limit],
+        )
+        return [(msg_id, score, json.loads(info)) for msg_id, score, info in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rank indexed candidates against a job description.')
+    parser.add_argument('query', nargs='*', help='free-text query or job description')
+    parser.add_argument('--file', help='read the job description from this file')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--db', default=SEARCH_FILE)
+    args = parser.parse_args(argv)
+    text = ' '.join(args.query)
+    if args.file:
+        text += ' ' + Path(args.file).read_text(encoding='utf-8')
+    if not text.strip():
+        parser.error('give a query or --file')
+    index = CandidateIndex(args.db)
+    for rank, (msg_id, score, info) in enumerate(index.search(text, args.limit), start=1):
+        print(f"{rank:>3}. {score:6.2f}  {info.get('name') or '?':<28} {info.get('job', ''):<22}"
+              f" {msg_id}  {info.get('link', '')}")
+    index.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
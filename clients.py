@@ -0,0 +1,138 @@
+import threading
+from pathlib import Path
+
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import DISCOVERY_URI, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from gmail_batch import RATE_LIMIT_REASONS
+from ratelimit import backoff_delay
+
+DISCOVERY_DIR = ".discovery"
+HTTP_TIMEOUT = 60
+# Gmail charges quota units per method; Drive and Sheets count requests.
+GMAIL_UNITS = 5
+GMAIL_SEND_UNITS = 100
+THROTTLE_BASE = 1
+THROTTLE_MAX = 60
+
+
+def request_units(api, uri, body) -> int:
+    each = 1
+    if api == 'gmail':
+        each = GMAIL_SEND_UNITS if uri.rstrip('/').endswith('/send') else GMAIL_UNITS
+    if '/batch' in uri and body:
+        # One HTTP request carrying one application/http part per call.
+        body = body if isinstance(body, bytes) else body.encode('utf-8', 'replace')
+        return each * max(1, body.count(b'application/http'))
+    return each
+
+
+class ThrottledHttp:
+    # Wraps an (authorized) Http so every request first draws its cost from
+    # the shared QuotaBudget, and a rate-limit response holds the whole API
+    # back for a jittered, growing pause rather than letting every thread
+    # hammer it.
+    def __init__(self, http, api, budget):
+        self.http = http
+        self.api = api
+        self.budget = budget
+        self.throttled = 0
+
+    def request(self, uri, method='GET', body=None, *args, **kwargs):
+        self.budget.acquire(self.api, request_units(self.api, uri, body))
+        resp, content = self.http.request(uri, method, body, *args, **kwargs)
+        status = int(resp.status)
+        if status == 429 or (status == 403 and any(r in (content or b'').lower() for r in RATE_LIMIT_REASONS)):
+            self.budget.pause(self.api, backoff_delay(self.throttled, THROTTLE_BASE, THROTTLE_MAX))
+            self.throttled += 1
+        else:
+            self.throttled = 0
+        return resp, content
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+class ClientRegistry:
+    # Builds each Google API service once per thread (httplib2 connections are
+    # not thread-safe) from a discovery document cached on disk, over a
+    # keep-alive Http. Credentials are loaded once; AuthorizedHttp refreshes
+    # them only when they are about to expire. With a ``budget`` (a
+    # ratelimit.QuotaBudget) every request is paced against it.
+    def __init__(self, token_file, service_account_file, discovery_dir=DISCOVERY_DIR, budget=None):
+        self.token_file = token_file
+        self.service_account_file = service_account_file
+        self.discovery_dir = Path(discovery_dir)
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._creds = {}
+        self._docs = {}
+        self._saved_token = None
+
+    def user_creds(self, scopes):
+        key = ('user', tuple(scopes))
+        with self._lock:
+            if key not in self._creds:
+                creds = Credentials.from_authorized_user_file(self.token_file, scopes)
+                if not creds.valid and creds.refresh_token:
+                    creds.refresh(Request())
+                self._creds[key] = creds
+            self._save_token(self._creds[key])
+            return self._creds[key]
+
+    def service_account_creds(self, scopes):
+        key = ('service_account', tuple(scopes))
+        with self._lock:
+            if key not in self._creds:
+                self._creds[key] = service_account.Credentials.from_service_account_file(
+                    self.service_account_file, scopes=scopes
+                )
+            return self._creds[key]
+
+    def _save_token(self, creds):
+        # Keep token.json current so a restart does not need a refresh first.
+        if creds.token and creds.token != self._saved_token:
+            Path(self.token_file).write_text(creds.to_json())
+            self._saved_token = creds.token
+
+    def discovery_doc(self, api, version) -> str:
+        key = (api, version)
+        with self._lock:
+            if key not in self._docs:
+                path = self.discovery_dir / f"{api}.{version}.json"
+                if path.exists():
+                    doc = path.read_text(encoding='utf-8')
+                else:
+                    doc = get_static_doc(api, version)
+                    if doc is None:
+                        uri = DISCOVERY_URI.format(api=api, apiVersion=version)
+                        _, content = httplib2.Http(timeout=HTTP_TIMEOUT).request(uri)
+                        doc = content.decode('utf-8')
+                    self.discovery_dir.mkdir(exist_ok=True)
+                    path.write_text(doc, encoding='utf-8')
+                self._docs[key] = doc
+            return self._docs[key]
+
+    def service(self, api, version, creds):
+        services = getattr(self._local, 'services', None)
+        if services is None:
+            services = self._local.services = {}
+        key = (api, version, id(creds))
+        if key not in services:
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+            if self.budget is not None:
+                http = ThrottledHttp(http, api, self.budget)
+            services[key] = build_from_document(self.discovery_doc(api, version), http=http)
+        return services[key]
+
+    def user_service(self, api, version, scopes):
+        return self.service(api, version, self.user_creds(scopes))
+
+    def service_account_service(self, api, version, scopes):
+        return self.service(api, version, self.service_account_creds(scopes))
@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlite_store import SqliteStore
+
+COORDINATION_FILE = "coordination.db"
+LEASE_SECONDS = 600
+# Finished claims only guard against a message being listed again before
+# the applicant index has it; after this long they are deleted.
+CLAIM_RETENTION = 7 * 24 * 3600
+
+
+class LeaseLost(RuntimeError):
+    pass
+
+
+class Coordinator(SqliteStore):
+    # Shared by every worker serving a set of mailboxes. A worker holds a
+    # time-limited lease on a mailbox while it runs a cycle for it, so each
+    # mailbox is served by one worker at a time and the mailboxes spread over
+    # however many workers there are. Message claims make sure that a worker
+    # which lost its lease (stalled past the expiry) and the one that took
+    # the mailbox over never both process a message, and the mailbox's sync
+    # checkpoint lives here so whichever worker gets it next carries on.
+    # The workers must share a host: WAL mode relies on shared memory that
+    # network file systems do not provide.
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS leases (
+        mailbox TEXT PRIMARY KEY,
+        owner TEXT,
+        expires REAL NOT NULL DEFAULT 0,
+        next_run REAL NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS claims (
+        mailbox TEXT NOT NULL,
+        msg_id TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        expires REAL NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (mailbox, msg_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        mailbox TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path=COORDINATION_FILE, lease_seconds=LEASE_SECONDS):
+        super().__init__(path)
+        self.lease_seconds = lease_seconds
+
+    def register(self, mailboxes):
+        with self.transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO leases (mailbox) VALUES (?)",
+                           [(m,) for m in mailboxes])
+
+    def acquire(self, owner, mailboxes):
+        # Leases the most overdue of ``mailboxes`` that nobody holds, or
+        # returns None if none is due yet.
+        now = time.time()
+        marks = ','.join('?' * len(mailboxes))
+        with self.transaction() as db:
+            row = db.execute(
+                f"SELECT mailbox FROM leases WHERE mailbox IN ({marks})"
+                " AND (owner IS NULL OR expires < ?) AND next_run <= ?"
+                " ORDER BY next_run LIMIT 1", (*mailboxes, now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE leases SET owner = ?, expires = ? WHERE mailbox = ?",
+                       (owner, now + self.lease_seconds, row[0]))
+            return row[0]
+
+    def next_due(self, mailboxes) -> float:
+        marks = ','.join('?' * len(mailboxes))
+        row = self.query(f"SELECT MIN(MAX(next_run, CASE WHEN owner IS NULL THEN 0 ELSE expires END))"
+                         f" FROM leases WHERE mailbox IN ({marks})", mailboxes)
+        return row[0][0] or time.time()
+
+    def renew(self, mailbox, owner) -> bool:
+        expires = time.time() + self.lease_seconds
+        with self.transaction() as db:
+            held = db.execute(
+                "UPDATE leases SET expires = ? WHERE mailbox = ? AND owner = ?",
+                (expires, mailbox, owner)
+            ).rowcount
+            if held:
+                db.execute("UPDATE claims SET expires = ? WHERE mailbox = ? AND owner = ? AND done = 0",
+                           (expires, mailbox, owner))
+            return bool(held)
+
+    def release(self, mailbox, owner, next_run):
+        self.execute(
+            "UPDATE leases SET owner = NULL, expires = 0, next_run = ? WHERE mailbox = ? AND owner = ?",
+            (next_run, mailbox, owner)
+        )
+
+    @contextmanager
+    def lease(self, mailbox, owner):
+        # Keeps the lease alive while the body runs; yields an Event that is
+        # set if the lease was lost (taken over after it lapsed).
+        stop, lost = threading.Event(), threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.renew(mailbox, owner):
+                    lost.set()
+                    return
+
+        thread = threading.Thread(target=heartbeat, name='lease-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stop.set()
+            thread.join()
+
+    def claim(self, mailbox, owner, msg_ids) -> list:
+        # Returns the ids this owner may process: new ones, its own earlier
+        # claims, and lapsed claims of other workers. Finished ones never.
+        now, mine = time.time(), []
+        with self.transaction() as db:
+            for msg_id in msg_ids:
+                row = db.execute("SELECT owner, expires, done FROM claims WHERE mailbox = ? AND msg_id = ?",
+                                 (mailbox, msg_id)).fetchone()
+                if row and (row[2] or (row[0] != owner and row[1] >= now)):
+                    continue
+                db.execute(
+                    "INSERT OR REPLACE INTO claims (mailbox, msg_id, owner, expires) VALUES (?, ?, ?, ?)",
+                    (mailbox, msg_id, owner, now + self.lease_seconds)
+                )
+                mine.append(msg_id)
+        return mine
+
+    def complete(self, mailbox, msg_ids):
+        # A finished claim's expires is the time it finished.
+        now = time.time()
+        with self.transaction() as db:
+            db.executemany("UPDATE claims SET done = 1, expires = ? WHERE mailbox = ? AND msg_id = ?",
+                           [(now, mailbox, m) for m in msg_ids])
+            db.execute("DELETE FROM claims WHERE done = 1 AND expires < ?", (now - CLAIM_RETENTION,))
+
+    def load_checkpoint(self, mailbox):
+        rows = self.query("SELECT value FROM checkpoints WHERE mailbox = ?", (mailbox,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def save_checkpoint(self, mailbox, checkpoint):
+        if checkpoint:
+            self.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?)",
+                         (mailbox, json.dumps(checkpoint)))
@@ -0,0 +1,37 @@
+import socket
+import threading
+
+TRIGGER_HOST = "127.0.0.1"
+TRIGGER_PORT = 8765
+# A client that connects and then sends nothing must not block the listener.
+TRIGGER_TIMEOUT = 2.0
+
+
+def serve_triggers(event, port=TRIGGER_PORT):
+    # Any local connection sending "run" sets ``event`` so the daemon starts a
+    # cycle right away instead of waiting out its sleep.
+    server = socket.create_server((TRIGGER_HOST, port))
+
+    def loop():
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                conn.settimeout(TRIGGER_TIMEOUT)
+                try:
+                    if conn.recv(16).strip() == b"run":
+                        event.set()
+                        conn.sendall(b"ok\n")
+                except OSError:
+                    pass
+
+    threading.Thread(target=loop, name='trigger-listener', daemon=True).start()
+    return server
+
+
+def send_trigger(port=TRIGGER_PORT, timeout=TRIGGER_TIMEOUT) -> bool:
+    try:
+        with socket.create_connection((TRIGGER_HOST, port), timeout=timeout) as conn:
+            conn.sendall(b"run\n")
+            return conn.recv(16).strip() == b"ok"
+    except OSError:
+        return False
@@ -0,0 +1,68 @@
+import io
+import mimetypes
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.http import MediaIoBaseUpload
+
+from gmail_batch import is_retryable
+
+UPLOAD_WORKERS = 4
+# Resumable chunks must be a multiple of 256 KiB.
+CHUNK_SIZE = 4 * 256 * 1024
+NUM_RETRIES = 5
+MAX_RESUMES = 5
+
+
+def upload_resumable(service, data: bytes, filename: str, folder_id: str) -> dict:
+    mime = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime, chunksize=CHUNK_SIZE, resumable=True)
+    request = service.files().create(
+        media_body=media,
+        body={'name': filename, 'parents': [folder_id]},
+        fields='id,webViewLink'
+    )
+    response, resumes = None, 0
+    while response is None:
+        try:
+            _, response = request.next_chunk(num_retries=NUM_RETRIES)
+        except Exception as e:
+            # After a dropped connection the next next_chunk() asks Drive how
+            # much of the upload session it already has and carries on from
+            # there rather than starting the file again.
+            resumes += 1
+            if resumes > MAX_RESUMES or not (isinstance(e, OSError) or is_retryable(e)):
+                raise
+            time.sleep(2 ** resumes)
+    return response
+
+
+class DriveUploader:
+    def __init__(self, service_factory, folder_id, workers=UPLOAD_WORKERS, observe=None):
+        # googleapiclient services are not thread-safe, so every upload
+        # thread builds and keeps its own. ``observe`` is called with the
+        # duration of every finished upload.
+        self.service_factory = service_factory
+        self.folder_id = folder_id
+        self.observe = observe
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='drive-upload')
+
+    def _service(self):
+        if getattr(self._local, 'service', None) is None:
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def _upload(self, data, filename):
+        started = time.perf_counter()
+        response = upload_resumable(self._service(), data, filename, self.folder_id)
+        if self.observe:
+            self.observe(time.perf_counter() - started)
+        return response
+
+    def submit(self, data: bytes, filename: str):
+        return self._executor.submit(self._upload, data, filename)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
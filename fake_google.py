@@ -0,0 +1,310 @@
+import base64
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from email.utils import formatdate
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+# In-process stand-ins for the Gmail, Drive and Sheets service objects that
+# googleapiclient builds, covering only the calls this bot makes. Every
+# execute() sleeps ``latency`` seconds and fails with a 429 rate-limit error
+# with probability ``quota_error_rate``; each endpoint's timings are recorded
+# in ``calls`` for the benchmark report.
+
+
+def rate_limit_error():
+    return HttpError(
+        httplib2.Response({'status': 429, 'reason': 'Too Many Requests'}),
+        b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}',
+    )
+
+
+class FakeApi:
+    def __init__(self, latency=0.0, quota_error_rate=0.0, seed=0):
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.calls = defaultdict(list)
+
+    def call(self, endpoint, handler, units=1, may_fail=True):
+        started = time.perf_counter()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            with self.lock:
+                if may_fail and self.random.random() < self.quota_error_rate:
+                    raise rate_limit_error()
+                return handler()
+        finally:
+            self.calls[endpoint].append((time.perf_counter() - started, units))
+
+    def request(self, endpoint, handler):
+        return FakeRequest(self, endpoint, handler)
+
+
+class FakeRequest:
+    def __init__(self, api, endpoint, handler):
+        self.api = api
+        self.endpoint = endpoint
+        self.handler = handler
+
+    def execute(self, num_retries=0):
+        return self.api.call(self.endpoint, self.handler)
+
+
+class Node:
+    # Attribute/method chaining: service.users().messages().get(...) etc.
+    def __init__(self, **children):
+        for name, child in children.items():
+            setattr(self, name, child)
+
+
+class FakeBatch:
+    def __init__(self, api, callback):
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request))
+
+    def execute(self):
+        # One round trip for the whole batch; each inner call fails on its own.
+        def run():
+            results = []
+            for request_id, request in self.requests:
+                if self.api.random.random() < self.api.quota_error_rate:
+                    results.append((request_id, None, rate_limit_error()))
+                    continue
+                try:
+                    results.append((request_id, request.handler(), None))
+                except HttpError as e:
+                    results.append((request_id, None, e))
+            return results
+
+        results = self.api.call('batch', run, units=len(self.requests), may_fail=False)
+        for request_id, response, exception in results:
+            self.callback(request_id, response, exception)
+
+
+class FakeGmail(FakeApi):
+    def __init__(self, messages=(), **kwargs):
+        super().__init__(**kwargs)
+        self.messages = {}
+        self.attachments = {}
+        self.order = []
+        self.history = []
+        self.history_id = 1000
+        self.sent = []
+        for message in messages:
+            self.deliver(message)
+
+        msgs = Node(
+            list=lambda userId, q=None, pageToken=None, maxResults=100, fields=None:
+                self.request('messages.list', lambda: self._list(pageToken, maxResults)),
+            get=lambda userId, id, **params:
+                self.request('messages.get', lambda: self._get(id, **params)),
+            send=lambda userId, body:
+                self.request('messages.send', lambda: self._send(body)),
+            attachments=lambda: Node(
+                get=lambda userId, messageId, id:
+                    self.request('attachments.get', lambda: {'data': self.attachments[id]}),
+            ),
+        )
+        history = Node(
+            list=lambda userId, startHistoryId, pageToken=None, historyTypes=None, fields=None:
+                self.request('history.list', lambda: self._history(startHistoryId)),
+        )
+        self._users = Node(
+            messages=lambda: msgs,
+            history=lambda: history,
+            getProfile=lambda userId:
+                self.request('getProfile', lambda: {'historyId': str(self.history_id)}),
+        )
+
+    def users(self):
+        return self._users
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def deliver(self, message):
+        # ``message``: dict with id, from, subject, body, filename, data.
+        with self.lock:
+            att_id = f"att-{message['id']}"
+            self.attachments[att_id] = base64.urlsafe_b64encode(message['data']).decode()
+            body = base64.urlsafe_b64encode(message['body'].encode()).decode()
+            self.messages[message['id']] = {
+                'id': message['id'],
+                'threadId': message['id'],
+                'payload': {
+                    'mimeType': 'multipart/mixed',
+                    'headers': [
+                        {'name': 'From', 'value': message['from']},
+                        {'name': 'Subject', 'value': message['subject']},
+                        {'name': 'Date', 'value': message.get('date') or formatdate()},
+                    ],
+                    'parts': [
+                        {'partId': '0', 'mimeType': 'text/plain', 'filename': '',
+                         'body': {'size': len(message['body']), 'data': body}},
+                        {'partId': '1', 'mimeType': 'application/octet-stream',
+                         'filename': message['filename'],
+                         'body': {'size': len(message['data']), 'attachmentId': att_id}},
+                    ],
+                },
+            }
+            self.order.insert(0, message['id'])
+            self.history_id += 1
+            self.history.append((self.history_id, message['id']))
+
+    def _list(self, page_token, max_results):
+        start = int(page_token or 0)
+        ids = self.order[start:start + max_results]
+        resp = {'messages': [{'id': i, 'threadId': i} for i in ids]}
+        if start + max_results < len(self.order):
+            resp['nextPageToken'] = str(start + max_results)
+        return resp
+
+    def _get(self, msg_id, format='full', metadataHeaders=None, fields=None):
+        if msg_id not in self.messages:
+            raise HttpError(httplib2.Response({'status': 404}), b'Not Found')
+        message = self.messages[msg_id]
+        if format == 'metadata':
+            wanted = set(metadataHeaders or [])
+            headers = [h for h in message['payload']['headers'] if not wanted or h['name'] in wanted]
+            return {'id': msg_id, 'payload': {'headers': headers}}
+        if fields and 'data' not in fields:
+            # Structure-only mask: the part tree without inline body data.
+            parts = [dict(p, body={k: v for k, v in p['body'].items() if k != 'data'})
+                     for p in message['payload']['parts']]
+            return {'id': msg_id, 'payload': dict(message['payload'], parts=parts)}
+        return message
+
+    def _history(self, start):
+        added = [m for h, m in self.history if h > int(start)]
+        resp = {'historyId': str(self.history_id)}
+        if added:
+            resp['history'] = [{'messagesAdded': [{'message': {'id': m}} for m in added]}]
+        return resp
+
+    def _send(self, body):
+        self.sent.append(body)
+        return {'id': f"sent-{len(self.sent)}"}
+
+
+class FakeUpload:
+    def __init__(self, api, media_body, body):
+        self.api = api
+        self.media = media_body
+        self.body = body
+        self.offset = 0
+
+    def next_chunk(self, num_retries=0):
+        size = self.media.size()
+        chunk = self.media.chunksize() if self.media.resumable() else size
+        self.offset = self.api.call('files.create', lambda: min(size, self.offset + chunk))
+        if self.offset < size:
+            return None, None
+        return None, self.api._store(self.body)
+
+    def execute(self, num_retries=0):
+        response = None
+        while response is None:
+            _, response = self.next_chunk()
+        return response
+
+
+class FakeDrive(FakeApi):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.stored = {}
+        self._files = Node(
+            create=lambda media_body, body, fields=None: FakeUpload(self, media_body, body),
+        )
+
+    def files(self):
+        return self._files
+
+    def _store(self, body):
+        file_id = f"file-{len(self.stored) + 1}"
+        self.stored[file_id] = body
+        return {'id': file_id, 'webViewLink': f"https://drive.example/{file_id}"}
+
+
+def _col(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+class FakeSheets(FakeApi):
+    def __init__(self, rows=(), **kwargs):
+        super().__init__(**kwargs)
+        self.rows = [list(r) for r in rows]
+        values = Node(
+            get=lambda spreadsheetId, range:
+                self.request('values.get', lambda: self._get(range)),
+            update=lambda spreadsheetId, range, valueInputOption, body:
+                self.request('values.update', lambda: self._update(range, body['values'])),
+            append=lambda spreadsheetId, range, valueInputOption, insertDataOption, body:
+                self.request('values.append', lambda: self._append(body['values'])),
+            batchGet=lambda spreadsheetId, ranges:
+                self.request('values.batchGet', lambda: {
+                    'valueRanges': [dict(self._get(r), range=r) for r in ranges]
+                }),
+            batchUpdate=lambda spreadsheetId, body:
+                self.request('values.batchUpdate', lambda: [
+                    self._update(d['range'], d['values']) for d in body['data']
+                ]),
+        )
+        self._spreadsheets = Node(values=lambda: values)
+
+    def spreadsheets(self):
+        return self._spreadsheets
+
+    @staticmethod
+    def _range(a1):
+        cells = a1.split('!')[-1]
+        m = re.match(r'([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$', cells)
+        c1, r1, c2, r2 = m.groups()
+        return (int(r1 or 1) - 1, int(r2) if r2 else None, _col(c1), _col(c2 or c1) + 1)
+
+    def _get(self, a1):
+        r1, r2, c1, c2 = self._range(a1)
+        values = [row[c1:c2] for row in self.rows[r1:r2]]
+        while values and not values[-1]:
+            values.pop()
+        return {'values': values} if values else {}
+
+    def _update(self, a1, values):
+        r1, _, c1, _ = self._range(a1)
+        for i, row in enumerate(values):
+            while len(self.rows) <= r1 + i:
+                self.rows.append([])
+            target = self.rows[r1 + i]
+            target.extend([''] * (c1 + len(row) - len(target)))
+            target[c1:c1 + len(row)] = row
+        return {}
+
+    def _append(self, values):
+        first = len(self.rows) + 1
+        self.rows.extend(list(r) for r in values)
+        return {'updates': {'updatedRange': f"Applicants!A{first}:M{first + len(values) - 1}"}}
+
+
+class FakeClients:
+    # Drop-in for clients.ClientRegistry.
+    def __init__(self, gmail, drive, sheets):
+        self.apis = {'gmail': gmail, 'drive': drive, 'sheets': sheets}
+
+    def user_service(self, api, version, scopes):
+        return self.apis[api]
+
+    def service_account_service(self, api, version, scopes):
+        return self.apis[api]
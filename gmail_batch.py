@@ -0,0 +1,104 @@
+import base64
+import time
+
+from googleapiclient.errors import HttpError
+
+from ratelimit import backoff_delay
+
+# Gmail accepts up to 100 calls per batch but starts rate limiting well
+# before that, so stay at the documented sweet spot.
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = (b'ratelimitexceeded', b'userratelimitexceeded')
+
+# Partial-response masks for messages.get. format=metadata carries headers
+# only, so finding the attachment needs format=full, masked down to the part
+# tree without any inline body data; the text/plain body is fetched
+# separately for the messages that turn out to be worth parsing.
+HEADERS = ('From', 'Subject', 'Date')
+STRUCTURE_FIELDS = 'id,payload(headers,parts(partId,mimeType,filename,body(attachmentId,size)))'
+BODY_FIELDS = 'id,payload(mimeType,body/data,parts(mimeType,body/data))'
+
+
+def is_retryable(exc) -> bool:
+    if not isinstance(exc, HttpError):
+        return False
+    status = int(exc.resp.status)
+    if status in RETRY_STATUSES:
+        return True
+    content = (exc.content or b'').lower()
+    return status == 403 and any(r in content for r in RATE_LIMIT_REASONS)
+
+
+# ``requests`` maps a key to a factory returning a fresh HttpRequest, so
+# failed calls can be re-added to a later batch. Keys whose call 404s (the
+# message was deleted after listing) are left out of the result.
+def run_batched(service, requests: dict) -> dict:
+    results, pending, last_error = {}, dict(requests), None
+    for attempt in range(MAX_ATTEMPTS):
+        failed = {}
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            elif is_retryable(exception):
+                failed[request_id] = exception
+            elif isinstance(exception, HttpError) and int(exception.resp.status) == 404:
+                pass
+            else:
+                failed[request_id] = exception
+
+        keys = list(pending)
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for key in keys[start:start + BATCH_SIZE]:
+                batch.add(pending[key](), request_id=key)
+            batch.execute()
+
+        fatal = [e for e in failed.values() if not is_retryable(e)]
+        if fatal:
+            raise fatal[0]
+        if not failed:
+            return results
+        last_error = next(iter(failed.values()))
+        pending = {k: pending[k] for k in failed}
+        time.sleep(backoff_delay(attempt, 2, 30))
+    raise last_error
+
+
+def get_messages(service, ids, **params) -> dict:
+    messages = service.users().messages()
+    requests = {
+        msg_id: (lambda msg_id=msg_id: messages.get(userId='me', id=msg_id, **params))
+        for msg_id in dict.fromkeys(ids)
+    }
+    return run_batched(service, requests)
+
+
+def get_headers(service, ids, headers=HEADERS) -> dict:
+    return get_messages(
+        service, ids, format='metadata', metadataHeaders=list(headers), fields='id,payload/headers'
+    )
+
+
+def get_structures(service, ids) -> dict:
+    return get_messages(service, ids, format='full', fields=STRUCTURE_FIELDS)
+
+
+def get_bodies(service, ids) -> dict:
+    return get_messages(service, ids, format='full', fields=BODY_FIELDS)
+
+
+def get_attachments(service, refs) -> dict:
+    attachments = service.users().messages().attachments()
+    refs = list(dict.fromkeys(refs))
+    requests = {
+        str(i): (lambda m=m, a=a: attachments.get(userId='me', messageId=m, id=a))
+        for i, (m, a) in enumerate(refs)
+    }
+    results = run_batched(service, requests)
+    return {
+        refs[int(key)]: base64.urlsafe_b64decode(att['data'])
+        for key, att in results.items()
+    }
@@ -3,9 +3,10 @@ import base64
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-import pandas as pd
 from google.oauth2.credentials import Credentials
 
+import gmail_batch
+
 SCOPES = [
     'https://www.googleapis.com/auth/gmail.readonly',
     'https://www.googleapis.com/auth/gmail.send',
@@ -30,14 +31,15 @@ def authenticate_gmail():
 def fetch_emails(creds, query='CV OR Resume OR Application', max_results=10):
     service = build('gmail', 'v1', credentials=creds)
     response = service.users().messages().list(
-        userId='me', q=query, maxResults=max_results
+        userId='me', q=query, maxResults=max_results, fields='messages/id'
     ).execute()
     messages = response.get('messages', [])
+    details = gmail_batch.get_headers(service, [m['id'] for m in messages])
     rows = []
     for message in messages:
-        msg = service.users().messages().get(
-            userId='me', id=message['id']
-        ).execute()
+        msg = details.get(message['id'])
+        if msg is None:
+            continue
         headers = msg['payload']['headers']
         sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
         subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
@@ -50,5 +52,6 @@ if __name__ == '__main__':
     credentials = authenticate_gmail()
     print('Fetching emails...')
     email_rows = fetch_emails(credentials)
+    import pandas as pd
     df = pd.DataFrame(email_rows, columns=['From', 'Subject', 'Date'])
     print(df)
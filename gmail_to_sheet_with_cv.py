@@ -1,20 +1,39 @@
-import io
+import argparse
+import asyncio
 import base64
-import mimetypes
+import functools
+import json
+import multiprocessing
+import os
+import socket
+import threading
 import time
 import sys
 import re
 from pathlib import Path
-from google.oauth2 import service_account, Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-from google.auth.transport.requests import Request
-from googleapiclient.errors import HttpError
-from pyresparser import ResumeParser
-import docx2txt
-from pdfminer.high_level import extract_text as extract_pdf_text
 from email.mime.text import MIMEText
 
+import ack_outbox
+import backfill
+import daemon_trigger
+import gmail_batch
+import gmail_sync
+import pipeline
+import resume_text
+import rule_parser
+from applicant_index import ApplicantIndex
+from candidate_search import CandidateIndex
+from clients import ClientRegistry
+from coordination import Coordinator, LeaseLost
+from drive_upload import DriveUploader, UPLOAD_WORKERS
+from job_matcher import JobMatcher, load_mapping
+from journal import Journal
+from metrics import Metrics
+from ratelimit import QuotaBudget, TokenBucket
+from scheduler import AdaptiveScheduler
+from resume_cache import ResumeCache
+from resume_engine import ResumeEngine, PARSE_WORKERS, warm_models
+
 TOKEN_FILE = "token.json"
 CLIENT_SECRET_FILE = "client_secret.json"
 SERVICE_ACCOUNT_FILE = "credentials.json"
@@ -28,8 +47,81 @@ QUERY = (
     'has:attachment (filename:pdf OR filename:doc OR filename:docx) '
     '(cv OR resume)'
 )
-CHECK_EVERY = 300
+# The daemon polls between POLL_MIN and POLL_MAX seconds apart depending on
+# how fast applications are arriving (see scheduler.AdaptiveScheduler).
+POLL_MIN = 30
+POLL_MAX = 900
 MAX_FETCH = 50
+# Messages per Gmail batch inside a cycle; smaller chunks reach the later
+# stages sooner, larger ones make fewer batch round trips.
+FETCH_CHUNK = 10
+FETCH_WORKERS = 2
+INCREMENTAL_SYNC = True
+CHECKPOINT_FILE = "sync_state.json"
+PARSE_TIMEOUT = 120
+# "rules" extracts the fields with regexes and a skills list (rule_parser);
+# "pyresparser" runs the full spaCy pipeline. Compare them on real CVs with
+#   python gmail_to_sheet_with_cv.py --compare-engines cv1.pdf cv2.docx ...
+PARSE_ENGINE = "rules"
+# Bump whenever parse_resume's output changes so cached results are re-parsed.
+PARSER_VERSION = "3"
+# Per-document limits, so one huge or malformed CV cannot hold a parse worker
+# for minutes. Attachments over MAX_ATTACHMENT_BYTES are stored but not
+# parsed; text extraction stops after MAX_PAGES pages, MAX_TEXT_CHARS
+# characters or EXTRACT_TIMEOUT seconds, and the row's status says so. The
+# timeout is checked between PDF pages; a .docx is decoded in one go, capped
+# by resume_text.MAX_DOCX_XML_BYTES.
+# Past EARLY_STOP_PAGES pages, a PDF is read no further once the email,
+# phone and a degree have been found, unless SEARCH_INDEX needs the whole
+# text. PARSE_TIMEOUT remains the hard limit after which the worker is killed.
+MAX_ATTACHMENT_BYTES = 10 * 1024 * 1024
+MAX_PAGES = 20
+MAX_TEXT_CHARS = 200_000
+EXTRACT_TIMEOUT = 30
+EARLY_STOP_PAGES = 3
+CACHE_FILE = "resume_cache.db"
+INDEX_FILE = "applicants.db"
+RECONCILE_EVERY = 3600
+JOURNAL_FILE = "journal.db"
+# Full-text index of CV text for candidate_search.py. While it is on, CVs are
+# read in full (early stop is off), so search covers every page up to
+# MAX_PAGES / MAX_TEXT_CHARS; text past those limits is never indexed.
+SEARCH_INDEX = True
+SEARCH_FILE = "candidates.db"
+# Rows are appended to the sheet as soon as this many are ready, so a crash
+# mid-cycle loses at most one chunk's worth of appends (and the journal
+# replays those on the next start).
+APPEND_CHUNK = 25
+# Historical backfill (--backfill): messages fetched per second across all
+# stages (each costs about 15 Gmail quota units of the 250/s per-user limit),
+# and rows per sheet append.
+BACKFILL_FILE = "backfill_state.json"
+BACKFILL_RATE = 10
+BACKFILL_APPEND_CHUNK = 500
+OUTBOX_FILE = "outbox.db"
+OUTBOX_POLL = 15
+# Sustained and burst acknowledgment send rate, per second.
+ACK_RATE = 1.0
+ACK_BURST = 5
+# Shared request budget per API, (units per second, burst), kept under the
+# per-user limits: Gmail 250 quota units/s, Drive and Sheets requests/min.
+QUOTA_LIMITS = {
+    'gmail': (200, 1000),
+    'drive': (10, 50),
+    'sheets': (1, 30),
+}
+# Worker mode (--worker): mailboxes listed in MAILBOXES_FILE are shared out
+# between worker processes on this host through leases in the coordination
+# store. It is SQLite in WAL mode, which needs shared memory, so
+# COORDINATION_FILE must be on a local disk, not a network share.
+# Each entry needs a "name" and may override token_file, query, sheet_id,
+# tab_name and drive_folder_id; its local state lives in STATE_DIR/<name>.
+MAILBOXES_FILE = "mailboxes.json"
+COORDINATION_FILE = "coordination.db"
+STATE_DIR = "mailboxes"
+METRICS_FILE = "metrics.prom"
+METRICS_JSONL = "metrics.jsonl"
+ERROR_LOG = "errors.jsonl"
 
 AUTO_REPLY_SUBJECT = "Application Received - [Your Company Name]"
 AUTO_REPLY_BODY_PLAIN = """Dear {applicant_name},
@@ -57,24 +149,18 @@ JOB_KEYWORDS_MAPPING = {
     "Human Resources": ["hr", "human resources", "recruiter", "talent acquisition", "people operations", "onboarding", "employee relations", "benefits"],
     "Sales Representative": ["sales", "rep", "business development", "account executive", "client relations", "crm", "lead generation", "negotiation"],
 }
+# Optional JSON file of title -> keywords (or keyword -> weight) replacing the
+# mapping above, so titles can be added without touching the code.
+JOB_KEYWORDS_FILE = "job_keywords.json"
+JOB_MATCHER = JobMatcher(load_mapping(JOB_KEYWORDS_FILE, JOB_KEYWORDS_MAPPING))
 
 
-def gmail_creds():
-    scopes = [
-        "https://www.googleapis.com/auth/gmail.readonly",
-        "https://www.googleapis.com/auth/gmail.send",
-    ]
-    creds = Credentials.from_authorized_user_file(TOKEN_FILE, scopes)
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-        Path(TOKEN_FILE).write_text(creds.to_json())
-    return creds
-
-
-def svc_creds(scopes):
-    return service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=scopes
-    )
+GMAIL_SCOPES = [
+    "https://www.googleapis.com/auth/gmail.readonly",
+    "https://www.googleapis.com/auth/gmail.send",
+]
+QUOTA = QuotaBudget(QUOTA_LIMITS)
+CLIENTS = ClientRegistry(TOKEN_FILE, SERVICE_ACCOUNT_FILE, budget=QUOTA)
 
 
 def send_acknowledgment_email(service, recipient, subject, body):
@@ -100,11 +186,7 @@ def get_email_body_text(payload) -> str:
 
 
 def infer_job_title(subject, body, cv_text) -> str:
-    text = f"{subject} {body} {cv_text}".lower()
-    for title, keywords in JOB_KEYWORDS_MAPPING.items():
-        if any(k in text for k in keywords):
-            return title
-    return "General Application"
+    return JOB_MATCHER.classify(subject, body, cv_text)
 
 
 def extract_phone_number(text: str) -> str:
@@ -117,14 +199,47 @@ def extract_phone_number(text: str) -> str:
     return max(valid, key=len) if valid else ""
 
 
-def parse_resume(data: bytes, filename: str) -> dict:
-    temp = Path("_temp" + Path(filename).suffix)
-    temp.write_bytes(data)
+YEAR_RE = re.compile(r'(?:19|20)\d{2}')
+
+
+def latest_year(entry: str) -> int:
+    return max((int(y) for y in YEAR_RE.findall(entry)), default=0)
+
+
+def fields_found(text: str) -> bool:
+    return (text.count('\f') >= EARLY_STOP_PAGES and bool(rule_parser.EMAIL_RE.search(text))
+            and bool(extract_phone_number(text)) and bool(rule_parser.DEGREE_RE.search(text)))
+
+
+def extract_fields(data: bytes, filename: str, engine=None):
+    # Returns (fields, text, truncated).
+    if (engine or PARSE_ENGINE) == 'pyresparser':
+        # pyresparser decodes the whole document itself; only its output
+        # can be capped.
+        info, text = resume_text.parse_with_pyresparser(data, filename)
+        return info, text[:MAX_TEXT_CHARS], len(text) > MAX_TEXT_CHARS
+    text, truncated = resume_text.extract_text_limited(
+        data, filename, max_pages=MAX_PAGES, max_chars=MAX_TEXT_CHARS,
+        deadline=time.monotonic() + EXTRACT_TIMEOUT,
+        enough=None if SEARCH_INDEX else fields_found,
+    )
+    return rule_parser.extract(text), text, truncated
+
+
+def skipped_resume(reason: str) -> dict:
+    return {
+        'name': '', 'email_cv': '', 'phone': '', 'skills': '', 'education': '',
+        'full_text_content': '', 'status': f'skipped: {reason}',
+    }
+
+
+def parse_resume(data: bytes, filename: str, engine=None) -> dict:
+    if len(data) > MAX_ATTACHMENT_BYTES:
+        return skipped_resume(f'attachment over {MAX_ATTACHMENT_BYTES // (1024 * 1024)} MB')
     try:
-        info = ResumeParser(str(temp)).get_extracted_data() or {}
-        text = extract_pdf_text(str(temp)) if filename.lower().endswith('.pdf') else docx2txt.process(str(temp))
-    finally:
-        temp.unlink(missing_ok=True)
+        info, text, truncated = extract_fields(data, filename, engine)
+    except (resume_text.DocumentTooLarge, resume_text.UnsupportedFormat) as e:
+        return skipped_resume(str(e))
 
     phone = extract_phone_number(text)
     skills = info.get('skills') or []
@@ -135,21 +250,137 @@ def parse_resume(data: bytes, filename: str) -> dict:
     education_entries = info.get('education') or []
     if isinstance(education_entries, str):
         education_entries = [e.strip() for e in education_entries.split(',')]
-    latest_edu = max(education_entries, key=lambda e: re.search(r'(19|20)\d{2}', e).group(0) if re.search(r'(19|20)\d{2}', e) else 0, default="")
+    latest_edu = max(education_entries, key=latest_year, default="")
 
     return {
-        'name': info.get('name', ''),
-        'email_cv': info.get('email', ''),
+        'name': info.get('name') or '',
+        'email_cv': info.get('email') or '',
         'phone': phone,
         'skills': skills_text,
         'education': latest_edu,
         'full_text_content': text,
+        'status': 'truncated' if truncated else '',
     }
 
 
+_engine = None
+_cache = None
+_index = None
+_journal = None
+_search = None
+_uploader = None
+_outbox = None
+# The getters below are first called concurrently from the pipeline's
+# threads, so creation is double-checked under this lock.
+_singletons_lock = threading.Lock()
+# Held while rows are appended and added to the index, and while the index is
+# rebuilt from the sheet, so a rebuild on the outbox thread cannot read the
+# sheet just before an append and then wipe that append from the index.
+_sheet_lock = threading.Lock()
+_lease_lost = None
+COORDINATOR = None
+WORKER_ID = None
+MAILBOX = None
+ACK_BUCKET = TokenBucket(ACK_RATE, ACK_BURST)
+METRICS = Metrics(ERROR_LOG)
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _singletons_lock:
+            if _engine is None:
+                warm = warm_models if PARSE_ENGINE == 'pyresparser' else None
+                _engine = ResumeEngine(parse_resume, PARSE_WORKERS, PARSE_TIMEOUT, warm=warm)
+    return _engine
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _singletons_lock:
+            if _cache is None:
+                _cache = ResumeCache(CACHE_FILE, f"{PARSER_VERSION}-{PARSE_ENGINE}")
+    return _cache
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _singletons_lock:
+            if _index is None:
+                _index = ApplicantIndex(INDEX_FILE)
+    return _index
+
+
+def get_journal():
+    global _journal
+    if _journal is None:
+        with _singletons_lock:
+            if _journal is None:
+                _journal = Journal(JOURNAL_FILE)
+    return _journal
+
+
+def get_search():
+    global _search
+    if _search is None:
+        with _singletons_lock:
+            if _search is None:
+                _search = CandidateIndex(SEARCH_FILE)
+    return _search
+
+
+def get_uploader():
+    global _uploader
+    if _uploader is None:
+        with _singletons_lock:
+            if _uploader is None:
+                _uploader = DriveUploader(drive_service, DRIVE_FOLDER_ID, UPLOAD_WORKERS)
+    return _uploader
+
+
+def get_outbox():
+    global _outbox
+    if _outbox is None:
+        with _singletons_lock:
+            if _outbox is None:
+                _outbox = ack_outbox.AckOutbox(OUTBOX_FILE)
+    return _outbox
+
+
+def close_workers():
+    for worker in (_engine, _uploader):
+        if worker is not None:
+            worker.close()
+
+
+def close_stores():
+    # Drops everything bound to the current mailbox's sheet, folder and files.
+    global _cache, _index, _journal, _search, _uploader, _outbox
+    with _singletons_lock:
+        for worker in (_uploader, _cache, _index, _journal, _search, _outbox):
+            if worker is not None:
+                worker.close()
+        _cache = _index = _journal = _search = _uploader = _outbox = None
+
+
+def load_checkpoint():
+    if COORDINATOR is not None:
+        return COORDINATOR.load_checkpoint(MAILBOX)
+    return gmail_sync.load_checkpoint(CHECKPOINT_FILE)
+
+
+def save_checkpoint(checkpoint):
+    if COORDINATOR is not None:
+        COORDINATOR.save_checkpoint(MAILBOX, checkpoint)
+    else:
+        gmail_sync.save_checkpoint(checkpoint, CHECKPOINT_FILE)
+
+
 def fetch_messages(service):
     return service.users().messages().list(
-        userId="me", q=QUERY, maxResults=MAX_FETCH
+        userId="me", q=QUERY, maxResults=MAX_FETCH, fields='messages/id'
     ).execute().get('messages', [])
 
 
@@ -158,20 +389,26 @@ def read_headers(md):
     return hdr.get('From', ''), hdr.get('Subject', ''), hdr.get('Date', '')
 
 
-def upload_cv_to_drive(service, data: bytes, filename: str) -> str:
-    mime = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
-    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime)
-    file = service.files().create(
-        media_body=media,
-        body={'name': filename, 'parents': [DRIVE_FOLDER_ID]},
-        fields='webViewLink'
-    ).execute()
-    return file['webViewLink']
+def find_cv_part(payload):
+    for part in payload.get('parts', []):
+        if part.get('filename') and Path(part['filename']).suffix.lower() in ALLOWED_EXT:
+            return part
+    return None
+
+
+def drive_service():
+    return CLIENTS.service_account_service('drive', 'v3', [
+        'https://www.googleapis.com/auth/drive.file'
+    ])
+
+
+def gmail_service():
+    return CLIENTS.user_service('gmail', 'v1', GMAIL_SCOPES)
 
 
 def get_sheet_service():
     scopes = ['https://www.googleapis.com/auth/spreadsheets']
-    return build('sheets', 'v4', credentials=svc_creds(scopes))
+    return CLIENTS.service_account_service('sheets', 'v4', scopes)
 
 
 def ensure_header(sheet):
@@ -191,31 +428,36 @@ def ensure_header(sheet):
         ).execute()
 
 
-def existing_applicants_data(sheet):
+def read_applicant_rows(sheet):
     resp = sheet.spreadsheets().values().get(
         spreadsheetId=SHEET_ID, range=f"{TAB_NAME}!A2:M"
     ).execute()
-    ids, email_links = set(), {}
-    for row in resp.get('values', []):
-        msg_id = row[0] if len(row) > 0 else ''
-        name = row[5].strip().lower() if len(row) > 5 else ''
-        email = row[6].strip().lower() if len(row) > 6 else ''
-        phone = row[7].strip().lower() if len(row) > 7 else ''
-        link = row[4] if len(row) > 4 else ''
-        if msg_id:
-            ids.add((msg_id, 'msg_id'))
-        if name and email:
-            ids.add((name, email, 'name_email'))
-            if email not in email_links and link:
-                email_links[email] = link
-        if phone:
-            ids.add((phone, 'phone_only'))
-    return ids, email_links
+    return resp.get('values', [])
+
+
+def reconcile_index(sheet, index):
+    if index.reconciled_within(RECONCILE_EVERY):
+        return
+    # Cheap check first: if the last row we know about is still the last row
+    # of the sheet, nobody else appended or deleted rows since.
+    last_row, last_msg_id = index.last_row()
+    resp = sheet.spreadsheets().values().get(
+        spreadsheetId=SHEET_ID, range=f"{TAB_NAME}!A{last_row}:A{last_row + 1}"
+    ).execute()
+    if last_msg_id and resp.get('values') == [[last_msg_id]]:
+        index.mark_reconciled()
+        return
+    rebuild_index(sheet, index)
+
+
+def rebuild_index(sheet, index):
+    with _sheet_lock:
+        index.rebuild(read_applicant_rows(sheet))
 
 
 def append_rows(sheet, rows):
     if rows:
-        sheet.spreadsheets().values().append(
+        return sheet.spreadsheets().values().append(
             spreadsheetId=SHEET_ID,
             range=f"{TAB_NAME}!A1",
             valueInputOption='USER_ENTERED',
@@ -224,63 +466,588 @@ def append_rows(sheet, rows):
         ).execute()
 
 
+def first_appended_row(resp) -> int:
+    # updatedRange looks like "Applicants!A12:M14"
+    cells = resp['updates']['updatedRange'].split('!')[-1]
+    return int(re.match(r'[A-Z]+(\d+)', cells).group(1))
+
+
+def flush_journal(sheet, index, journal, limit=APPEND_CHUNK):
+    # Appends journaled rows in chunks of ``limit``. Rows are marked
+    # 'appending' before the request so that a crash between the append and
+    # the index update can be told apart from one before the append.
+    while True:
+        ready = journal.ready(limit)
+        if not ready:
+            return
+        msg_ids, rows = [m for m, _ in ready], [r for _, r in ready]
+        if _lease_lost is not None and _lease_lost.is_set():
+            # Another worker has the mailbox now; leave the rows journaled.
+            raise LeaseLost(f"lease on mailbox {MAILBOX!r} lapsed")
+        journal.mark_appending(msg_ids)
+        with _sheet_lock:
+            with METRICS.timer('append'):
+                resp = append_rows(sheet, rows)
+            index.add_rows(rows, first_appended_row(resp))
+        journal.remove(msg_ids)
+        if COORDINATOR is not None:
+            COORDINATOR.complete(MAILBOX, msg_ids)
+        METRICS.inc('messages_total', len(rows), result='processed')
+
+
+def recover_journal(sheet, index, journal):
+    # A previous run stopped with work in the journal. Rows left 'appending'
+    # may or may not have reached the sheet, so re-read the sheet and only
+    # resend the ones that are missing; 'ready' rows are simply appended.
+    stuck = journal.appending()
+    if stuck:
+        rebuild_index(sheet, index)
+        landed = index.seen_ids(stuck)
+        journal.remove(landed)
+        journal.mark_ready([m for m in stuck if m not in landed])
+    METRICS.inc('journal_replayed_total', journal.count())
+    flush_journal(sheet, index, journal)
+
+
+def rows_still_match(sheet, located) -> bool:
+    # Recruiters may sort, filter or delete rows, so a row number cached in
+    # the index is only trusted if that row still holds the same MsgID.
+    resp = sheet.spreadsheets().values().batchGet(
+        spreadsheetId=SHEET_ID, ranges=[f"{TAB_NAME}!A{row}" for _, row, _ in located]
+    ).execute()
+    found = [r.get('values', [['']])[0][0] for r in resp.get('valueRanges', [])]
+    return found == [msg_id for msg_id, _, _ in located]
+
+
+def write_ack_statuses(sheet, outbox, index):
+    unreported = outbox.unreported()
+    if not unreported:
+        return
+    # Not-yet-appended messages have no row; they are reported on a later pass.
+    def locate():
+        rows = ((m, index.row_of(m), status) for m, status in unreported)
+        return [r for r in rows if r[1] is not None]
+
+    located = locate()
+    if not located:
+        return
+    if not rows_still_match(sheet, located):
+        rebuild_index(sheet, index)
+        located = locate()
+    if located:
+        sheet.spreadsheets().values().batchUpdate(
+            spreadsheetId=SHEET_ID,
+            body={'valueInputOption': 'USER_ENTERED', 'data': [
+                {'range': f"{TAB_NAME}!M{row}", 'values': [['Yes' if status == 'sent' else 'No']]}
+                for _, row, status in located
+            ]}
+        ).execute()
+        outbox.mark_reported([m for m, _, _ in located])
+
+
+def deliver_acknowledgments(gmail, sheet):
+    outbox = get_outbox()
+    with METRICS.timer('send'):
+        sent = ack_outbox.drain(
+            outbox, lambda *msg: send_acknowledgment_email(gmail, *msg), ACK_BUCKET
+        )
+    METRICS.inc('acks_sent_total', sent)
+    write_ack_statuses(sheet, outbox, get_index())
+
+
+def outbox_worker(stop):
+    gmail, sheet = gmail_service(), get_sheet_service()
+    while not stop.wait(OUTBOX_POLL):
+        try:
+            deliver_acknowledgments(gmail, sheet)
+        except Exception as e:
+            record_failure('send', e)
+
+
+def record_failure(stage, exc):
+    if ack_outbox.is_quota_error(exc):
+        METRICS.inc('throttled_total', stage=stage)
+    METRICS.error(stage, exc)
+
+
+def export_metrics():
+    METRICS.write_prometheus(METRICS_FILE)
+    METRICS.write_jsonl(METRICS_JSONL)
+
+
+# Stages of the per-message pipeline in _run_cycle. Each takes and returns a
+# dict describing one message (or a list of them for the first two), or
+# None to drop the message.
+def fetch_stage(ids):
+    # Headers and the part tree only; no body data is transferred here.
+    messages = gmail_batch.get_structures(gmail_service(), ids)
+    found = []
+    for msg_id in ids:
+        part = find_cv_part(messages[msg_id]['payload']) if msg_id in messages else None
+        if part:
+            found.append({'id': msg_id, 'md': messages[msg_id], 'part': part})
+    METRICS.inc('messages_total', len(ids) - len(found), result='no_attachment')
+    return found or None
+
+
+def download_stage(msgs):
+    gmail = gmail_service()
+    bodies = gmail_batch.get_bodies(gmail, [msg['id'] for msg in msgs])
+    refs = [(msg['id'], msg['part']['body']['attachmentId']) for msg in msgs]
+    attachments = gmail_batch.get_attachments(gmail, refs)
+    downloaded = []
+    for msg, ref in zip(msgs, refs):
+        if attachments.get(ref):
+            msg['data'], msg['filename'] = attachments[ref], msg['part']['filename']
+            body = bodies.get(msg['id'])
+            msg['body'] = get_email_body_text(body['payload']) if body else ''
+            msg['sha'] = ResumeCache.key(msg['data'])
+            downloaded.append(msg)
+    return downloaded
+
+
+def parse_stage(msg):
+    cache = get_cache()
+    msg['parsed'], msg['link'] = cache.get(msg['sha'])
+    if msg['parsed'] is not None:
+        METRICS.inc('cache_hits_total')
+        return msg
+    if len(msg['data']) > MAX_ATTACHMENT_BYTES:
+        # Not worth shipping to a worker just to be turned away.
+        msg['parsed'] = parse_resume(msg['data'], msg['filename'])
+    else:
+        try:
+            msg['parsed'] = get_engine().parse_one(msg['data'], msg['filename'])
+        except Exception as e:
+            # The applicant still gets a row and an acknowledgment; only the
+            # CV fields are missing. Not cached, so a resend is tried again.
+            timed_out = isinstance(e, multiprocessing.TimeoutError)
+            METRICS.inc('messages_total', result='parse_timeout' if timed_out else 'parse_failed')
+            METRICS.error('parse', e, sha256=msg['sha'], filename=msg['filename'])
+            msg['parsed'] = skipped_resume('parse timeout' if timed_out else 'parse failed')
+            return msg
+    cache.put(msg['sha'], parsed=msg['parsed'])
+    return msg
+
+
+def row_status(parsed) -> str:
+    status = parsed.get('status')
+    return f"New Application (CV {status})" if status else 'New Application'
+
+
+def classify_stage(msg):
+    parsed = msg['parsed']
+    frm, sub, date = read_headers(msg['md'])
+    email = parsed['email_cv'] or re.search(r'<([^>]+)>', frm).group(1) if '<' in frm else frm
+    if get_index().is_duplicate(parsed['name'], email, parsed['phone']):
+        METRICS.inc('messages_total', result='deduped')
+        return None
+    job = infer_job_title(sub, msg['body'], parsed['full_text_content'])
+    phone = parsed['phone']
+    phone = f"'{phone}" if phone and not phone.startswith("'") else phone
+    msg['email'] = email
+    msg['row'] = [
+        msg['id'], frm, sub, date, msg['link'],
+        parsed['name'], parsed['email_cv'], phone,
+        parsed['skills'], job, row_status(parsed),
+        parsed['education'], 'Queued'
+    ]
+    return msg
+
+
+async def upload_stage(in_flight, msg):
+    # ``in_flight`` maps content hash -> upload future for this cycle, so the
+    # same file sent in two emails is uploaded once.
+    if not msg['link']:
+        if msg['sha'] not in in_flight:
+            in_flight[msg['sha']] = asyncio.wrap_future(
+                get_uploader().submit(msg['data'], msg['filename'])
+            )
+        msg['link'] = (await in_flight[msg['sha']])['webViewLink']
+        get_cache().put(msg['sha'], link=msg['link'])
+        msg['row'][4] = msg['link']
+    del msg['data']
+    return msg
+
+
+def ack_stage(msg):
+    first_name = (msg['parsed']['name'].split() or ['Applicant'])[0]
+    get_outbox().enqueue(msg['id'], msg['email'], AUTO_REPLY_SUBJECT,
+                         AUTO_REPLY_BODY_PLAIN.format(applicant_name=first_name))
+    get_journal().record_ready(msg['id'], msg['row'])
+    return msg
+
+
+def record_stage(msg):
+    # Backfill dry run: no acknowledgment for historical mail.
+    msg['row'][-1] = 'Not sent (backfill)'
+    get_journal().record_ready(msg['id'], msg['row'])
+    return msg
+
+
+def search_stage(msg):
+    if not SEARCH_INDEX:
+        return msg
+    row = msg['row']
+    get_search().add(msg['id'], msg['parsed']['full_text_content'],
+                     name=row[5], email=msg['email'], job=row[9], link=row[4])
+    return msg
+
+
+def append_stage(sheet, chunk, msg):
+    journal = get_journal()
+    if journal.count('ready') >= chunk:
+        flush_journal(sheet, get_index(), journal, chunk)
+
+
 def run_once():
-    gmail = build('gmail', 'v1', credentials=gmail_creds())
-    drive = build('drive', 'v3', credentials=svc_creds([
-        'https://www.googleapis.com/auth/drive.file'
-    ]))
+    # Returns (new messages seen, whether work was left for the next cycle,
+    # whether Google throttled any of it).
+    with METRICS.timer('cycle'):
+        return _run_cycle()
+
+
+def _run_cycle():
+    gmail = gmail_service()
+    checkpoint = None
+    with METRICS.timer('list'):
+        if INCREMENTAL_SYNC:
+            checkpoint = load_checkpoint()
+            candidate_ids, checkpoint = gmail_sync.changed_message_ids(
+                gmail, QUERY, checkpoint, MAX_FETCH
+            )
+        else:
+            candidate_ids = [m['id'] for m in fetch_messages(gmail)]
+    METRICS.inc('messages_listed_total', len(candidate_ids))
+    journal = get_journal()
+    if not candidate_ids and not journal.count():
+        save_checkpoint(checkpoint)
+        return 0, False, False
     sheet = get_sheet_service()
+    index = get_index()
+    with METRICS.timer('dedup'):
+        ensure_header(sheet)
+        reconcile_index(sheet, index)
+    if journal.count():
+        recover_journal(sheet, index, journal)
+    arrived = len(candidate_ids) - len(index.seen_ids(candidate_ids))
+    retry_later, throttled = process_messages(sheet, index, journal, candidate_ids)
+    if not retry_later:
+        save_checkpoint(checkpoint)
+    # Without incremental sync a full page means more may be waiting. Work
+    # left behind by throttling is not a backlog: polling sooner would only
+    # be throttled again.
+    backlog = (retry_later and not throttled) or (not INCREMENTAL_SYNC and len(candidate_ids) >= MAX_FETCH)
+    return arrived, backlog, throttled
+
+
+def process_messages(sheet, index, journal, candidate_ids, ack=True,
+                     append_chunk=APPEND_CHUNK, bucket=None) -> tuple:
+    # Runs the not-yet-processed ids through the pipeline and appends their
+    # rows. Returns (whether some message failed in a way worth retrying or
+    # is still claimed by another worker, whether any failure was Google's
+    # rate limit).
+    # ``bucket`` (a TokenBucket) paces how fast messages are fetched.
+    with METRICS.timer('dedup'):
+        seen = index.seen_ids(candidate_ids)
+    new_ids = [msg_id for msg_id in candidate_ids if msg_id not in seen]
+    METRICS.inc('messages_total', len(seen), result='already_processed')
+    retry_later = throttled = False
+    if COORDINATOR is not None:
+        claimed = COORDINATOR.claim(MAILBOX, WORKER_ID, new_ids)
+        METRICS.inc('messages_total', len(new_ids) - len(claimed), result='claimed_elsewhere')
+        # Their owner may die before finishing them, and an incremental sync
+        # past them would never list them again, so hold the checkpoint.
+        retry_later = len(claimed) < len(new_ids)
+        new_ids = claimed
+
+    def on_error(stage, msg, exc):
+        nonlocal retry_later, throttled
+        METRICS.inc('messages_total', result=f'{stage}_failed')
+        record_failure(stage, exc)
+        retry_later = True
+        throttled = throttled or ack_outbox.is_quota_error(exc)
+
+    def chunks():
+        for i in range(0, len(new_ids), FETCH_CHUNK):
+            chunk = new_ids[i:i + FETCH_CHUNK]
+            if bucket:
+                bucket.acquire(len(chunk))
+            yield chunk
+
+    pipeline.run(chunks(), [
+        pipeline.Stage('get', fetch_stage, FETCH_WORKERS),
+        pipeline.Stage('attachment', download_stage, FETCH_WORKERS, fan_out=True),
+        pipeline.Stage('parse', parse_stage, max(1, PARSE_WORKERS)),
+        pipeline.Stage('classify', classify_stage),
+        pipeline.Stage('upload', functools.partial(upload_stage, {}), UPLOAD_WORKERS),
+        # Ordered, so rows are journaled (and appended) in listing order.
+        pipeline.Stage('ack', ack_stage if ack else record_stage, ordered=True),
+        pipeline.Stage('search', search_stage),
+        pipeline.Stage('append', functools.partial(append_stage, sheet, append_chunk)),
+    ], observe=METRICS.observe, on_error=on_error)
+    flush_journal(sheet, index, journal, append_chunk)
+    return retry_later, throttled
+
+
+def run_backfill(after=None, before=None, window_days=None, dry_run=False):
+    # Pages through every message matching QUERY in [after, before), oldest
+    # window first, checkpointing after each page so an interrupted backfill
+    # picks up where it stopped. Stops at the first page with a failure that
+    # is worth retrying; running it again retries that page.
+    plan = {'query': QUERY, 'after': after, 'before': before, 'windowDays': window_days}
+    state = backfill.load_state(BACKFILL_FILE)
+    if state and state.get('plan') == plan and state.get('done'):
+        print("Backfill already complete; delete the state file to run it again.")
+        return True
+    resume_start, page_token = backfill.resume_point(state, plan)
+    resuming = bool(state) and state.get('plan') == plan
+    gmail, sheet, index, journal = gmail_service(), get_sheet_service(), get_index(), get_journal()
     ensure_header(sheet)
-    ids, links = existing_applicants_data(sheet)
-    seen = {i[0] for i in ids if i[1] == 'msg_id'}
-    rows = []
-    for msg in fetch_messages(gmail):
-        if msg['id'] in seen:
+    reconcile_index(sheet, index)
+    if journal.count():
+        recover_journal(sheet, index, journal)
+    bucket = TokenBucket(BACKFILL_RATE, BACKFILL_RATE * FETCH_CHUNK)
+    for window in backfill.windows(after, before, window_days):
+        if resuming and resume_start is not None and window[0] < resume_start:
             continue
-        md = gmail.users().messages().get(userId='me', id=msg['id']).execute()
-        frm, sub, date = read_headers(md)
-        body_text = get_email_body_text(md['payload'])
-        attachment_bytes, filename = None, None
-        for part in md['payload'].get('parts', []):
-            if part.get('filename') and Path(part['filename']).suffix.lower() in ALLOWED_EXT:
-                att = gmail.users().messages().attachments().get(
-                    userId='me', messageId=msg['id'], id=part['body']['attachmentId']
-                ).execute()
-                attachment_bytes = base64.urlsafe_b64decode(att['data'])
-                filename = part['filename']
-                break
-        if not attachment_bytes:
+        token = None
+        if resuming and window[0] == resume_start:
+            if page_token is None:
+                # That window was finished.
+                continue
+            token = page_token
+        query = backfill.window_query(QUERY, *window)
+        for ids, next_token in gmail_sync.list_pages(gmail, query, token):
+            METRICS.inc('messages_listed_total', len(ids))
+            with METRICS.timer('backfill_page'):
+                retry, _ = process_messages(sheet, index, journal, ids, ack=not dry_run,
+                                         append_chunk=BACKFILL_APPEND_CHUNK, bucket=bucket)
+            if retry:
+                print("Stopping: some messages failed; run the backfill again to retry.")
+                return False
+            backfill.save_state({'plan': plan, 'start': window[0], 'pageToken': next_token},
+                                BACKFILL_FILE)
+            print(f"{time.strftime('%H:%M:%S')} window {window}: {len(ids)} messages listed")
+    backfill.save_state({'plan': plan, 'done': True}, BACKFILL_FILE)
+    return True
+
+
+def run_forever(wake):
+    # Create the shared stores before the outbox thread can race to do so.
+    get_index()
+    get_journal()
+    get_search()
+    get_outbox()
+    threading.Thread(target=outbox_worker, args=(threading.Event(),), daemon=True).start()
+    scheduler = AdaptiveScheduler(POLL_MIN, POLL_MAX)
+    while True:
+        wake.clear()
+        try:
+            scheduler.record(*run_once())
+        except Exception as e:
+            record_failure('cycle', e)
+            if ack_outbox.is_quota_error(e):
+                scheduler.record_throttled()
+        export_metrics()
+        wake.wait(scheduler.next_delay())
+
+
+STATE_FILES = {
+    'CHECKPOINT_FILE': CHECKPOINT_FILE, 'CACHE_FILE': CACHE_FILE, 'INDEX_FILE': INDEX_FILE,
+    'JOURNAL_FILE': JOURNAL_FILE, 'SEARCH_FILE': SEARCH_FILE, 'OUTBOX_FILE': OUTBOX_FILE,
+    'BACKFILL_FILE': BACKFILL_FILE,
+}
+MAILBOX_SETTINGS = ('TOKEN_FILE', 'QUERY', 'SHEET_ID', 'TAB_NAME', 'DRIVE_FOLDER_ID')
+DEFAULTS = {name: globals()[name] for name in MAILBOX_SETTINGS}
+_registries = {}
+
+
+def load_mailboxes(path=MAILBOXES_FILE) -> list:
+    mailboxes = json.loads(Path(path).read_text(encoding='utf-8'))
+    names = [m['name'] for m in mailboxes]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate mailbox names in {path}")
+    return mailboxes
+
+
+def configure(mailbox):
+    # Points the module-level settings, state files and clients at one
+    # mailbox; called between cycles, never during one.
+    global MAILBOX, CLIENTS
+    close_stores()
+    settings = globals()
+    for name in MAILBOX_SETTINGS:
+        settings[name] = mailbox.get(name.lower(), DEFAULTS[name])
+    state_dir = Path(STATE_DIR) / mailbox['name']
+    state_dir.mkdir(parents=True, exist_ok=True)
+    for name, filename in STATE_FILES.items():
+        settings[name] = str(state_dir / filename)
+    if TOKEN_FILE not in _registries:
+        _registries[TOKEN_FILE] = ClientRegistry(TOKEN_FILE, SERVICE_ACCOUNT_FILE, budget=QUOTA)
+    CLIENTS = _registries[TOKEN_FILE]
+    MAILBOX = mailbox['name']
+
+
+def run_worker(mailboxes, worker_id, stop=None):
+    # Repeatedly leases whichever mailbox is most overdue, runs one cycle and
+    # its acknowledgments for it, and hands it back with its next due time.
+    global COORDINATOR, WORKER_ID, METRICS_FILE, METRICS_JSONL, _lease_lost
+    COORDINATOR, WORKER_ID = Coordinator(COORDINATION_FILE), worker_id
+    METRICS_FILE, METRICS_JSONL = f"metrics.{worker_id}.prom", f"metrics.{worker_id}.jsonl"
+    by_name = {m['name']: m for m in mailboxes}
+    names = list(by_name)
+    COORDINATOR.register(names)
+    schedulers = {name: AdaptiveScheduler(POLL_MIN, POLL_MAX) for name in names}
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        name = COORDINATOR.acquire(worker_id, names)
+        if name is None:
+            stop.wait(min(POLL_MIN, max(1.0, COORDINATOR.next_due(names) - time.time())))
             continue
-        parsed = parse_resume(attachment_bytes, filename)
-        email = parsed['email_cv'] or re.search(r'<([^>]+)>', frm).group(1) if '<' in frm else frm
-        name_lower = parsed['name'].strip().lower()
-        if (name_lower, email.lower(), 'name_email') in ids or (parsed['phone'], 'phone_only') in ids:
+        scheduler = schedulers[name]
+        configure(by_name[name])
+        try:
+            with COORDINATOR.lease(name, worker_id) as _lease_lost:
+                scheduler.record(*run_once())
+                deliver_acknowledgments(gmail_service(), get_sheet_service())
+        except Exception as e:
+            record_failure('cycle', e)
+            if ack_outbox.is_quota_error(e):
+                scheduler.record_throttled()
+        finally:
+            _lease_lost = None
+            COORDINATOR.release(name, worker_id, time.time() + scheduler.next_delay())
+            export_metrics()
+    close_stores()
+    close_workers()
+
+
+def _worker_process(mailboxes, worker_id, parse_workers, quota_limits):
+    global PARSE_WORKERS, QUOTA
+    PARSE_WORKERS = parse_workers
+    QUOTA = QuotaBudget(quota_limits)
+    _registries.clear()
+    run_worker(mailboxes, worker_id)
+
+
+def start_workers(mailboxes, processes):
+    # Splits the parse pool and the API budget between the worker processes
+    # so N workers neither start N full pools nor spend N times the quota.
+    parse_workers = max(1, PARSE_WORKERS // processes)
+    quota_limits = {api: (rate / processes, max(1, burst // processes))
+                    for api, (rate, burst) in QUOTA_LIMITS.items()}
+    host = socket.gethostname()
+    workers = [
+        multiprocessing.Process(
+            target=_worker_process, name=f"worker-{i}",
+            args=(mailboxes, f"{host}-{os.getpid()}-{i}", parse_workers, quota_limits),
+        )
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def warm_up():
+    get_engine().warm()
+    gmail_service()
+    drive_service()
+    get_sheet_service()
+
+
+def field_agreement(a: dict, b: dict) -> dict:
+    norm = lambda v: ' '.join(str(v).lower().split())
+    scores = {f: float(norm(a[f]) == norm(b[f])) for f in ('name', 'email_cv', 'phone', 'education')}
+    # Skills are a set, so score the overlap rather than exact equality.
+    sa = {norm(s) for s in a['skills'].split(',') if s.strip()}
+    sb = {norm(s) for s in b['skills'].split(',') if s.strip()}
+    scores['skills'] = len(sa & sb) / len(sa | sb) if sa | sb else 1.0
+    return scores
+
+
+def compare_engines(paths):
+    # Parses each file with both engines and prints per-field agreement of
+    # the rules engine with pyresparser, plus the time each engine took.
+    totals, elapsed, n = {}, {'pyresparser': 0.0, 'rules': 0.0}, 0
+    for path in paths:
+        data = Path(path).read_bytes()
+        results = {}
+        for engine in elapsed:
+            started = time.perf_counter()
+            try:
+                results[engine] = parse_resume(data, path, engine)
+            except Exception as e:
+                print(f"{path}: {engine} failed: {e}")
+            elapsed[engine] += time.perf_counter() - started
+        if len(results) < 2:
             continue
-        link = upload_cv_to_drive(drive, attachment_bytes, filename)
-        status = 'Yes' if send_acknowledgment_email(gmail, email, AUTO_REPLY_SUBJECT,
-                                                 AUTO_REPLY_BODY_PLAIN.format(applicant_name=parsed['name'].split()[0])) else 'No'
-        job = infer_job_title(sub, body_text, parsed['full_text_content'])
-        phone = parsed['phone']
-        phone = f"'{phone}" if phone and not phone.startswith("'") else phone
-        rows.append([
-            msg['id'], frm, sub, date, link,
-            parsed['name'], parsed['email_cv'], phone,
-            parsed['skills'], job, 'New Application',
-            parsed['education'], status
-        ])
-        seen.add(msg['id'])
-    append_rows(sheet, rows)
+        n += 1
+        for field, score in field_agreement(results['pyresparser'], results['rules']).items():
+            totals[field] = totals.get(field, 0.0) + score
+    print(f"{n} of {len(paths)} files parsed by both engines")
+    for field, total in totals.items():
+        print(f"  {field:<10} {total / n:6.1%} agreement")
+    for engine, seconds in elapsed.items():
+        print(f"  {engine:<12} {seconds / max(1, len(paths)) * 1000:8.1f} ms/file")
 
 
 if __name__ == '__main__':
-    if len(sys.argv) > 1 and sys.argv[1] == '--once':
-        run_once()
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in ('--once', '--drain-outbox'):
+        try:
+            if command == '--once':
+                run_once()
+            deliver_acknowledgments(gmail_service(), get_sheet_service())
+        except Exception as e:
+            record_failure('cycle', e)
+            raise
+        finally:
+            close_workers()
+            export_metrics()
         sys.exit()
-    while True:
+    if command == '--backfill':
+        # python gmail_to_sheet_with_cv.py --backfill [--after 2024-01-01]
+        #     [--before 2024-07-01] [--window-days 7] [--dry-run]
+        parser = argparse.ArgumentParser(prog='gmail_to_sheet_with_cv.py --backfill')
+        parser.add_argument('--after', type=backfill.parse_date)
+        parser.add_argument('--before', type=backfill.parse_date)
+        parser.add_argument('--window-days', type=int)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='add rows without sending acknowledgment emails')
+        args = parser.parse_args(sys.argv[2:])
         try:
-            run_once()
-        except HttpError:
-            pass
-        except Exception:
-            pass
-        time.sleep(CHECK_EVERY)
+            done = run_backfill(args.after, args.before, args.window_days, args.dry_run)
+            if not args.dry_run:
+                deliver_acknowledgments(gmail_service(), get_sheet_service())
+        finally:
+            close_workers()
+            export_metrics()
+        sys.exit(0 if done else 1)
+    if command == '--worker':
+        # python gmail_to_sheet_with_cv.py --worker [--config mailboxes.json]
+        #     [--processes 4]
+        parser = argparse.ArgumentParser(prog='gmail_to_sheet_with_cv.py --worker')
+        parser.add_argument('--config', default=MAILBOXES_FILE)
+        parser.add_argument('--processes', type=int, default=1)
+        args = parser.parse_args(sys.argv[2:])
+        mailboxes = load_mailboxes(args.config)
+        if args.processes > 1:
+            start_workers(mailboxes, args.processes)
+        else:
+            run_worker(mailboxes, f"{socket.gethostname()}-{os.getpid()}")
+        sys.exit()
+    if command == '--compare-engines':
+        compare_engines(sys.argv[2:])
+        sys.exit()
+    if command == '--trigger':
+        sys.exit(0 if daemon_trigger.send_trigger() else 1)
+    wake = threading.Event()
+    if command == '--daemon':
+        # Stay resident with models and clients loaded; `--trigger` from
+        # another shell (or the scheduled task) starts a cycle immediately.
+        daemon_trigger.serve_triggers(wake)
+        warm_up()
+    run_forever(wake)
@@ -1,7 +1,7 @@
 import os
-from google.oauth2 import service_account, Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+
+import gmail_batch
+from clients import ClientRegistry
 
 SHEET_ID = "1BsCSX_JfuXNrVh1YfrGSq2X9rGvedOL3tcBYFfZYgSY"
 TAB_NAME = "Applicants"
@@ -11,36 +11,32 @@ QUERY = "CV OR Resume OR Application"
 TOKEN_FILE = "token.json"
 SERVICE_ACCOUNT_FILE = "credentials.json"
 
-
-def gmail_creds(scopes):
-    creds = Credentials.from_authorized_user_file(TOKEN_FILE, scopes)
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-    return creds
+CLIENTS = ClientRegistry(TOKEN_FILE, SERVICE_ACCOUNT_FILE)
 
 
 def sheets_service():
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=["https://www.googleapis.com/auth/spreadsheets"],
+    return CLIENTS.service_account_service(
+        "sheets", "v4", ["https://www.googleapis.com/auth/spreadsheets"],
     )
-    return build("sheets", "v4", credentials=creds)
 
 
 def fetch_email_rows(max_results=MAX_EMAILS, query=QUERY):
-    service = build(
-        "gmail", "v1", credentials=gmail_creds(["https://www.googleapis.com/auth/gmail.readonly"]),
+    service = CLIENTS.user_service(
+        "gmail", "v1", ["https://www.googleapis.com/auth/gmail.readonly"],
     )
     messages = (
         service.users()
         .messages()
-        .list(userId="me", q=query, maxResults=max_results)
+        .list(userId="me", q=query, maxResults=max_results, fields="messages/id")
         .execute()
         .get("messages", [])
     )
+    details = gmail_batch.get_headers(service, [msg["id"] for msg in messages])
     rows = []
     for msg in messages:
-        data = service.users().messages().get(userId="me", id=msg["id"]).execute()
+        data = details.get(msg["id"])
+        if data is None:
+            continue
         headers = data["payload"]["headers"]
         sender = next((h["value"] for h in headers if h["name"] == "From"), "")
         subject = next((h["value"] for h in headers if h["name"] == "Subject"), "")
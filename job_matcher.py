@@ -0,0 +1,93 @@
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+
+DEFAULT_TITLE = "General Application"
+# A keyword in the subject line says more about the role applied for than the
+# same keyword somewhere in the email body, which in turn beats the CV.
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+# The title itself ("Product Manager") is the strongest keyword for a role,
+# and a listed phrase ("product management") is more specific than a single
+# word, so each extra word of a plain-list keyword adds its weight again.
+TITLE_WEIGHT = 5.0
+BOUNDARY_CHARS = r'\w+#'
+
+
+def load_mapping(path, default=None) -> dict:
+    # JSON object of title -> list of keywords, or title -> {keyword: weight}.
+    p = Path(path)
+    if not p.exists():
+        return default
+    return json.loads(p.read_text(encoding='utf-8'))
+
+
+def trie_pattern(words) -> str:
+    # One regex shaped like a trie of the keywords, so matching cost grows
+    # with keyword length rather than with the number of keywords.
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        alts = []
+        for ch in sorted(k for k in node if k):
+            token = r'\s+' if ch == ' ' else re.escape(ch)
+            alts.append(token + build(node[ch]))
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        if '' in node:
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class JobMatcher:
+    def __init__(self, mapping: dict, default=DEFAULT_TITLE):
+        self.titles = list(mapping)
+        self.default = default
+        self.keywords = {}
+        for i, keywords in enumerate(mapping.values()):
+            if not isinstance(keywords, dict):
+                keywords = {k: float(len(k.split())) for k in keywords}
+            keywords = {self.titles[i].lower(): TITLE_WEIGHT, **keywords}
+            for keyword, weight in keywords.items():
+                keyword = ' '.join(keyword.lower().split())
+                self.keywords.setdefault(keyword, []).append((i, float(weight)))
+        # A keyword listed under several titles is weaker evidence for each.
+        for keyword, entries in self.keywords.items():
+            self.keywords[keyword] = [(i, w / len(entries)) for i, w in entries]
+        self.pattern = re.compile(
+            rf'(?<![{BOUNDARY_CHARS}])(?:{trie_pattern(self.keywords)})(?![{BOUNDARY_CHARS}])'
+        )
+
+    def scores(self, *fields) -> list:
+        scores = [0.0] * len(self.titles)
+        for text, field_weight in zip(fields, FIELD_WEIGHTS):
+            hits = Counter(' '.join(m.group(0).split()) for m in self.pattern.finditer(text.lower()))
+            for keyword, count in hits.items():
+                # Repeating a word forty times in a CV should not drown out
+                # everything else, so repeats count logarithmically.
+                for i, weight in self.keywords[keyword]:
+                    scores[i] += field_weight * weight * (1 + math.log(count))
+        return scores
+
+    def classify(self, subject='', body='', cv_text='') -> str:
+        scores = self.scores(subject or '', body or '', cv_text or '')
+        best = max(range(len(scores)), key=scores.__getitem__, default=None)
+        if best is None or scores[best] <= 0:
+            return self.default
+        # Two titles equally likely is no evidence for either; picking the
+        # first listed would quietly favour it.
+        if sum(math.isclose(score, scores[best]) for score in scores) > 1:
+            return self.default
+        return self.titles[best]
+
+    def classify_many(self, documents) -> list:
+        return [self.classify(*doc) for doc in documents]
@@ -0,0 +1,66 @@
+import json
+import time
+
+from sqlite_store import SqliteStore
+
+JOURNAL_FILE = "journal.db"
+
+
+class Journal(SqliteStore):
+    # Write-ahead record of messages whose expensive work is done but whose
+    # sheet row may not exist yet. A message is 'ready' once it has been
+    # parsed, uploaded and its acknowledgment queued, 'appending' while its
+    # row is being sent to the sheet, and is removed once the row is in the
+    # applicant index. Rows keep the order they became ready in.
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS journal (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        msg_id TEXT NOT NULL UNIQUE,
+        stage TEXT NOT NULL,
+        row TEXT NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS journal_stage ON journal (stage, seq);
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        super().__init__(path)
+
+    def record_ready(self, msg_id, row):
+        self.execute(
+            "INSERT OR IGNORE INTO journal (msg_id, stage, row, updated) VALUES (?, 'ready', ?, ?)",
+            (msg_id, json.dumps(row), time.time()),
+        )
+
+    def count(self, stage=None) -> int:
+        if stage is None:
+            return self.query("SELECT COUNT(*) FROM journal")[0][0]
+        return self.query("SELECT COUNT(*) FROM journal WHERE stage = ?", (stage,))[0][0]
+
+    def ready(self, limit):
+        return [
+            (msg_id, json.loads(row)) for msg_id, row in self.query(
+                "SELECT msg_id, row FROM journal WHERE stage = 'ready' ORDER BY seq LIMIT ?", (limit,)
+            )
+        ]
+
+    def appending(self) -> list:
+        return [r[0] for r in self.query("SELECT msg_id FROM journal WHERE stage = 'appending'")]
+
+    def _set_stage(self, msg_ids, stage):
+        now = time.time()
+        with self.transaction() as db:
+            db.executemany(
+                "UPDATE journal SET stage = ?, updated = ? WHERE msg_id = ?",
+                [(stage, now, m) for m in msg_ids],
+            )
+
+    def mark_appending(self, msg_ids):
+        self._set_stage(msg_ids, 'appending')
+
+    def mark_ready(self, msg_ids):
+        self._set_stage(msg_ids, 'ready')
+
+    def remove(self, msg_ids):
+        with self.transaction() as db:
+            db.executemany("DELETE FROM journal WHERE msg_id = ?", [(m,) for m in msg_ids])
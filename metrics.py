@@ -0,0 +1,115 @@
+import json
+import math
+import os
+import threading
+import time
+import traceback
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+PREFIX = "recbot"
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+RECENT_SAMPLES = 1000
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    def __init__(self, error_log=None, prefix=PREFIX):
+        self.error_log = error_log
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.buckets = defaultdict(lambda: [0] * len(BUCKETS))
+        self.sums = defaultdict(float)
+        self.recent = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+
+    def inc(self, name, n=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += n
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            counts = self.buckets[stage]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    counts[i] += 1
+            self.sums[stage] += seconds
+            self.recent[stage].append(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def error(self, stage, exc, **context):
+        self.inc('errors_total', stage=stage, type=type(exc).__name__)
+        if not self.error_log:
+            return
+        record = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'stage': stage,
+            'type': type(exc).__name__,
+            'message': str(exc),
+            'traceback': traceback.format_exception(type(exc), exc, exc.__traceback__)[-3:],
+            **context,
+        }
+        with self.lock, open(self.error_log, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            stages = {}
+            for stage, counts in self.buckets.items():
+                recent = sorted(self.recent[stage])
+                pick = lambda p: recent[min(len(recent) - 1, int(p / 100 * len(recent)))]
+                stages[stage] = {
+                    'count': counts[-1],
+                    'sum_s': self.sums[stage],
+                    'p50_s': pick(50),
+                    'p95_s': pick(95),
+                    'p99_s': pick(99),
+                }
+            counters = {
+                name + _labels(dict(labels)): value
+                for (name, labels), value in self.counters.items()
+            }
+            return {'ts': time.time(), 'counters': counters, 'stages': stages}
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self.lock:
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f"# TYPE {self.prefix}_{name} counter")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{self.prefix}_{name}{_labels(dict(labels))} {value:g}")
+            if self.buckets:
+                metric = f"{self.prefix}_stage_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for stage, counts in sorted(self.buckets.items()):
+                    for bound, count in zip(BUCKETS, counts):
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {count}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {self.sums[stage]:.6f}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {counts[-1]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Write-then-rename so a textfile collector never reads half a file.
+        tmp = Path(f"{path}.tmp")
+        tmp.write_text(self.prometheus_text(), encoding='utf-8')
+        os.replace(tmp, path)
+
+    def write_jsonl(self, path):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
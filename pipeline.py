@@ -0,0 +1,147 @@
+import asyncio
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# A small staged runner: items flow from a source through stages connected by
+# bounded asyncio queues, each stage served by its own number of workers.
+# When a downstream stage falls behind its queue fills up and the stages
+# feeding it wait, so at most about ``queue_size`` items per stage are in
+# memory at once, and a cycle takes roughly as long as its slowest stage
+# rather than the sum of all of them.
+
+QUEUE_SIZE = 8
+_DONE = object()
+
+
+class Stage:
+    # ``fn`` takes one item and returns the item to pass on, or None to drop
+    # it. Plain functions run on a thread (they are expected to block on I/O
+    # or on a worker process); coroutine functions run on the event loop.
+    # With ``fan_out`` the function returns a list of items instead. An
+    # ``ordered`` stage (give it one worker) sees its items in source order:
+    # each is held back until every item before it has reached the stage or
+    # been dropped, so what waits behind a slow item is not bounded by
+    # ``queue_size``.
+    def __init__(self, name, fn, workers=1, queue_size=QUEUE_SIZE, fan_out=False, ordered=False):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.fan_out = fan_out
+        self.ordered = ordered
+
+
+class _Reorder:
+    # Stands in for an ordered stage's inbox. ``pending`` holds the keys of
+    # items still upstream; an arrived item is released once no pending key
+    # sorts before it. Nothing here awaits, so updates cannot interleave.
+    def __init__(self, queue):
+        self.queue = queue
+        self.pending = set()
+        self.held = []
+
+    def settle(self, seq, parts=()):
+        # ``seq`` left upstream (dropped, or split into ``parts``).
+        self.pending.discard(seq)
+        self.pending.update(parts)
+        self._release()
+
+    async def put(self, item):
+        self.pending.discard(item[0])
+        heapq.heappush(self.held, item)
+        self._release()
+
+    def _release(self):
+        first = min(self.pending, default=None)
+        while self.held and (first is None or self.held[0][0] < first):
+            self.queue.put_nowait(heapq.heappop(self.held))
+
+
+async def _call(stage, value, executor):
+    if asyncio.iscoroutinefunction(stage.fn):
+        return await stage.fn(value)
+    return await asyncio.get_running_loop().run_in_executor(executor, stage.fn, value)
+
+
+async def _work(stage, inbox, outbox, executor, observe, on_error, reorders):
+    # ``reorders`` are those of the ordered stages downstream of this one.
+    while True:
+        item = await inbox.get()
+        if item is _DONE:
+            return
+        seq, value = item
+        started = time.perf_counter()
+        try:
+            result = await _call(stage, value, executor)
+        except Exception as e:
+            if on_error:
+                on_error(stage.name, value, e)
+            result = None
+        finally:
+            if observe:
+                observe(stage.name, time.perf_counter() - started)
+        if result is None:
+            for reorder in reorders:
+                reorder.settle(seq)
+            continue
+        if not stage.fan_out:
+            await outbox.put((seq, result))
+            continue
+        # Extend the sequence key so fanned-out items keep source order.
+        parts = [(seq + (i,), part) for i, part in enumerate(result)]
+        for reorder in reorders:
+            reorder.settle(seq, [key for key, _ in parts])
+        for part in parts:
+            await outbox.put(part)
+
+
+async def _feed(source, inbox, executor, reorders):
+    # The source may block (e.g. page through an API), so pull from it on a
+    # thread too.
+    loop = asyncio.get_running_loop()
+    items = iter(source)
+    seq = 0
+    while True:
+        value = await loop.run_in_executor(executor, next, items, _DONE)
+        if value is _DONE:
+            return
+        for reorder in reorders:
+            reorder.settle(None, [(seq,)])
+        await inbox.put(((seq,), value))
+        seq += 1
+
+
+async def _run(source, stages, observe, on_error):
+    queues = [asyncio.Queue(0 if stage.ordered else stage.queue_size) for stage in stages]
+    reorders = [_Reorder(q) if stage.ordered else None for stage, q in zip(stages, queues)]
+    results = []
+    sink = asyncio.Queue()
+    outboxes = [r or q for r, q in zip(reorders[1:], queues[1:])] + [sink]
+    threads = sum(s.workers for s in stages if not asyncio.iscoroutinefunction(s.fn)) + 1
+    with ThreadPoolExecutor(threads, thread_name_prefix='pipeline') as executor:
+        tasks = []
+        for i, (stage, inbox, outbox) in enumerate(zip(stages, queues, outboxes)):
+            downstream = [r for r in reorders[i + 1:] if r]
+            tasks.append([
+                asyncio.create_task(_work(stage, inbox, outbox, executor, observe, on_error, downstream))
+                for _ in range(stage.workers)
+            ])
+        await _feed(source, reorders[0] or queues[0], executor, [r for r in reorders if r])
+        # Shut the stages down front to back: a stage is done once everything
+        # upstream has finished and its own workers have drained the queue.
+        for stage, inbox, workers in zip(stages, queues, tasks):
+            for _ in workers:
+                await inbox.put(_DONE)
+            await asyncio.gather(*workers)
+    while not sink.empty():
+        results.append(sink.get_nowait())
+    return [value for _, value in sorted(results, key=lambda r: r[0])]
+
+
+def run(source, stages, observe=None, on_error=None) -> list:
+    # Returns the values that came out of the last stage, in source order.
+    # ``observe(stage, seconds)`` is called for every item a stage handles and
+    # ``on_error(stage, item, exc)`` for every item a stage raised on; that
+    # item is dropped and the rest carry on.
+    return asyncio.run(_run(source, stages, observe, on_error))
@@ -0,0 +1,60 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, n=1):
+        # A request larger than the bucket could never be granted; it waits
+        # for a full bucket instead.
+        n = min(n, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        # Push the bucket into debt so nothing is granted for ``seconds``.
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # Exponential backoff with jitter in [d/2, d), so workers that were
+    # throttled together do not all come back at the same moment.
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class QuotaBudget:
+    # One token bucket per API, shared by every thread and service object
+    # that calls it. ``limits`` maps api -> (units per second, burst).
+    def __init__(self, limits: dict):
+        self.buckets = {api: TokenBucket(rate, burst) for api, (rate, burst) in limits.items()}
+
+    def acquire(self, api, units=1):
+        bucket = self.buckets.get(api)
+        if bucket:
+            bucket.acquire(units)
+
+    def pause(self, api, seconds):
+        bucket = self.buckets.get(api)
+        if bucket:
+            bucket.pause(seconds)
@@ -1,17 +1,13 @@
 import io, base64, mimetypes, time, sys, re
 from pathlib import Path
-from google.oauth2 import service_account
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
-from google.auth.transport.requests import Request
 from googleapiclient.errors import HttpError
-from pyresparser import ResumeParser
-import pandas as pd
-import docx2txt
-from pdfminer.high_level import extract_text as extract_pdf_text
 from email.mime.text import MIMEText
 
+import gmail_batch
+from clients import ClientRegistry
+import resume_text
+
 TOKEN_FILE = "token.json"
 SERVICE_ACCOUNT_FILE = "credentials.json"
 SHEET_ID = "1BsCSX_JfuXNrVh1YfrGSq2X9rGvedOL3tcBYFfZYgSY"
@@ -41,16 +37,8 @@ JOB_KEYWORDS_MAPPING = {
     "Data Analyst": ["data", "analyst", "analytics", "sql", "python"],
 }
 
-def gmail_creds():
-    scopes = ["https://www.googleapis.com/auth/gmail.readonly", "https://www.googleapis.com/auth/gmail.send"]
-    creds = Credentials.from_authorized_user_file(TOKEN_FILE, scopes)
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-        Path(TOKEN_FILE).write_text(creds.to_json())
-    return creds
-
-def svc_creds(scopes):
-    return service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=scopes)
+GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.readonly", "https://www.googleapis.com/auth/gmail.send"]
+CLIENTS = ClientRegistry(TOKEN_FILE, SERVICE_ACCOUNT_FILE)
 
 def send_acknowledgment_email(gmail_service, recipient_email, subject, body):
     message = MIMEText(body, 'plain')
@@ -87,13 +75,7 @@ def extract_phone_number(text):
     return ""
 
 def parse_resume(bytes_, filename):
-    temp_file = Path("_temp_resume" + Path(filename).suffix)
-    temp_file.write_bytes(bytes_)
-    try:
-        parsed_data = ResumeParser(str(temp_file)).get_extracted_data() or {}
-        full_text_content = extract_pdf_text(str(temp_file)) if filename.lower().endswith(".pdf") else docx2txt.process(str(temp_file))
-    finally:
-        temp_file.unlink(missing_ok=True)
+    parsed_data, full_text_content = resume_text.parse_with_pyresparser(bytes_, filename)
 
     final_phone = extract_phone_number(full_text_content)
 
@@ -109,21 +91,29 @@ def parse_resume(bytes_, filename):
     }
 
 def run_once():
-    gmail = build("gmail", "v1", credentials=gmail_creds())
-    drive = build("drive", "v3", credentials=svc_creds(["https://www.googleapis.com/auth/drive.file"]))
-    sh = build("sheets", "v4", credentials=svc_creds(["https://www.googleapis.com/auth/spreadsheets"]))
+    gmail = CLIENTS.user_service("gmail", "v1", GMAIL_SCOPES)
+    drive = CLIENTS.service_account_service("drive", "v3", ["https://www.googleapis.com/auth/drive.file"])
+    sh = CLIENTS.service_account_service("sheets", "v4", ["https://www.googleapis.com/auth/spreadsheets"])
 
-    msgs = gmail.users().messages().list(userId="me", q=QUERY, maxResults=MAX_FETCH).execute().get("messages", [])
-
-    for m in msgs:
-        md = gmail.users().messages().get(userId="me", id=m["id"]).execute()
-        frm, sub, date = [h.get(hdr) for hdr in ["From", "Subject", "Date"] for h in md["payload"]["headers"] if h["name"] == hdr]
+    msgs = gmail.users().messages().list(userId="me", q=QUERY, maxResults=MAX_FETCH, fields="messages/id").execute().get("messages", [])
 
+    messages = gmail_batch.get_structures(gmail, [m["id"] for m in msgs])
+    attachments = {}
+    for msg_id, md in messages.items():
         attachment = next((p for p in md["payload"].get("parts", []) if p.get("filename")), None)
         if attachment:
-            data = gmail.users().messages().attachments().get(userId="me", messageId=m["id"], id=attachment["body"]["attachmentId"]).execute()
-            resume_bytes = base64.urlsafe_b64decode(data["data"])
+            attachments[msg_id] = attachment
+    attachment_data = gmail_batch.get_attachments(gmail, [(msg_id, a["body"]["attachmentId"]) for msg_id, a in attachments.items()])
+
+    for m in msgs:
+        if m["id"] not in attachments:
+            continue
+        md = messages[m["id"]]
+        frm, sub, date = [h.get(hdr) for hdr in ["From", "Subject", "Date"] for h in md["payload"]["headers"] if h["name"] == hdr]
 
+        attachment = attachments[m["id"]]
+        resume_bytes = attachment_data.get((m["id"], attachment["body"]["attachmentId"]))
+        if resume_bytes:
             parsed = parse_resume(resume_bytes, attachment["filename"])
             cv_link = upload_cv_to_drive(drive, resume_bytes, attachment["filename"])
 
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import time
+
+from sqlite_store import SqliteStore
+
+CACHE_FILE = "resume_cache.db"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResumeCache(SqliteStore):
+    # Keyed by the SHA-256 of the attachment bytes. The Drive link stays valid
+    # whatever parser produced the fields, so invalidating a parser version
+    # only drops the parsed fields.
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS resume_cache (
+        sha256 TEXT PRIMARY KEY,
+        parser_version TEXT,
+        parsed TEXT,
+        link TEXT,
+        size INTEGER NOT NULL DEFAULT 0,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS resume_cache_lru ON resume_cache (last_used);
+    """
+
+    def __init__(self, path=CACHE_FILE, parser_version="1", max_bytes=CACHE_MAX_BYTES):
+        super().__init__(path)
+        self.parser_version = parser_version
+        self.max_bytes = max_bytes
+        self.invalidate()
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, sha):
+        rows = self.query(
+            "SELECT parser_version, parsed, link FROM resume_cache WHERE sha256 = ?", (sha,)
+        )
+        if not rows:
+            return None, None
+        version, parsed, link = rows[0]
+        self.execute("UPDATE resume_cache SET last_used = ? WHERE sha256 = ?", (time.time(), sha))
+        if parsed is None or version != self.parser_version:
+            return None, link
+        return json.loads(parsed), link
+
+    def put(self, sha, parsed=None, link=None):
+        parsed_json = json.dumps(parsed) if parsed is not None else None
+        version = self.parser_version if parsed is not None else None
+        with self.transaction() as db:
+            db.execute(
+                "INSERT INTO resume_cache (sha256, parser_version, parsed, link, last_used)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(sha256) DO UPDATE SET"
+                " parser_version = COALESCE(excluded.parser_version, parser_version),"
+                " parsed = COALESCE(excluded.parsed, parsed),"
+                " link = COALESCE(excluded.link, link),"
+                " last_used = excluded.last_used",
+                (sha, version, parsed_json, link, time.time()),
+            )
+            db.execute(
+                "UPDATE resume_cache SET size = LENGTH(COALESCE(parsed, '')) + LENGTH(COALESCE(link, ''))"
+                " WHERE sha256 = ?", (sha,)
+            )
+        self.evict()
+
+    def evict(self):
+        with self.transaction() as db:
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM resume_cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            doomed = []
+            for sha, size in db.execute("SELECT sha256, size FROM resume_cache ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                doomed.append((sha,))
+                total -= size
+            db.executemany("DELETE FROM resume_cache WHERE sha256 = ?", doomed)
+
+    def invalidate(self):
+        self.execute(
+            "UPDATE resume_cache SET parsed = NULL, parser_version = NULL,"
+            " size = LENGTH(COALESCE(link, '')) WHERE parser_version != ?",
+            (self.parser_version,),
+        )
+        self.execute("DELETE FROM resume_cache WHERE parsed IS NULL AND link IS NULL")
@@ -0,0 +1,107 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+JOB_TIMEOUT = 120
+MAX_TASKS_PER_CHILD = 50
+# How often a waiting job checks whether its pool was killed under it, and
+# how many times it is moved to a fresh pool before giving up.
+RESTART_POLL = 0.25
+MAX_RESUBMITS = 2
+
+
+def warm_models():
+    # pyresparser calls spacy.load() for both of its models on every
+    # ResumeParser it builds. Memoise the loader so a process pays that cost
+    # once, then load everything up front so the first job is not slow.
+    import spacy
+    if not hasattr(spacy.load, 'cache_info'):
+        spacy.load = functools.lru_cache(maxsize=None)(spacy.load)
+    from nltk.corpus import stopwords
+    from pyresparser import resume_parser
+    spacy.load('en_core_web_sm')
+    spacy.load(os.path.dirname(os.path.abspath(resume_parser.__file__)))
+    stopwords.words('english')
+
+
+def _init_worker(warm):
+    # A worker whose initializer raises is replaced immediately, forever, so
+    # a missing model must not escape here; the jobs themselves will report it.
+    try:
+        warm()
+    except Exception:
+        pass
+
+
+class ResumeEngine:
+    def __init__(self, parse, workers=PARSE_WORKERS, timeout=JOB_TIMEOUT,
+                 max_tasks_per_child=MAX_TASKS_PER_CHILD, warm=warm_models):
+        self.parse = parse
+        # Preloads whatever ``parse`` needs in each worker; None for nothing.
+        self.warm_fn = warm
+        self.workers = workers
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(
+                    self.workers,
+                    initializer=_init_worker if self.warm_fn else None,
+                    initargs=(self.warm_fn,) if self.warm_fn else (),
+                    maxtasksperchild=self.max_tasks_per_child,
+                )
+            return self._pool
+
+    def warm(self):
+        # Start the workers now so their models are loaded before any job.
+        if self.workers > 0:
+            self._get_pool()
+        elif self.warm_fn:
+            self.warm_fn()
+
+    def _restart(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def parse_one(self, data: bytes, filename: str) -> dict:
+        # Thread-safe single job for callers that feed the pool from several
+        # threads. Raises whatever the parse raised, or TimeoutError once this
+        # job has had its full time slice. A job whose pool was killed under
+        # it (another job timed out) is resubmitted to the new pool with a
+        # fresh slice rather than failed.
+        if self.workers <= 0:
+            return self.parse(data, filename)
+        for _ in range(MAX_RESUBMITS + 1):
+            pool = self._get_pool()
+            res = pool.apply_async(self.parse, (data, filename))
+            deadline = time.monotonic() + self.timeout
+            while not res.ready():
+                if self._pool is not pool and not res.ready():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Our own job is the stuck one; kill the pool to reclaim
+                    # the worker.
+                    with self._lock:
+                        if self._pool is pool:
+                            self._restart()
+                    raise multiprocessing.TimeoutError(f"parse took over {self.timeout}s")
+                res.wait(min(remaining, RESTART_POLL))
+            else:
+                return res.get()
+        raise multiprocessing.TimeoutError("parse pool kept restarting")
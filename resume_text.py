@@ -0,0 +1,124 @@
+import io
+import os
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# pdfminer, docx2txt and pyresparser (which pulls in spaCy and NLTK) are
+# imported inside the functions that use them, so a cycle with nothing to
+# parse never pays for loading them.
+
+# Formats whose readers accept a file object; anything else (legacy .doc via
+# textract) still needs a real path.
+STREAMABLE_EXT = {".pdf", ".docx"}
+# A .docx is a zip; its main part is parsed into memory whole, so refuse
+# files whose document.xml inflates past this.
+MAX_DOCX_XML_BYTES = 20 * 1024 * 1024
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def resume_stream(data: bytes, filename: str) -> io.BytesIO:
+    # pyresparser takes the extension from the stream name by splitting on the
+    # first '.', so never pass the applicant's own filename through.
+    stream = io.BytesIO(data)
+    stream.name = "resume" + Path(filename).suffix.lower()
+    return stream
+
+
+@contextmanager
+def resume_source(data: bytes, filename: str):
+    suffix = Path(filename).suffix.lower()
+    if suffix in STREAMABLE_EXT:
+        yield resume_stream(data, filename)
+        return
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        yield path
+    finally:
+        Path(path).unlink(missing_ok=True)
+
+
+def extract_text(data: bytes, filename: str) -> str:
+    return extract_text_limited(data, filename)[0]
+
+
+def pdf_pages(data: bytes, max_pages=None):
+    # One string per page, decoded lazily so the caller can stop early.
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    for page in extract_pages(io.BytesIO(data), maxpages=max_pages or 0):
+        yield ''.join(el.get_text() for el in page if isinstance(el, LTTextContainer)) + '\f'
+
+
+def check_docx(data: bytes):
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            size = z.getinfo('word/document.xml').file_size
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ValueError(f"not a .docx file: {e}") from e
+    if size > MAX_DOCX_XML_BYTES:
+        raise DocumentTooLarge(f"document.xml is {size} bytes uncompressed")
+
+
+def extract_text_limited(data: bytes, filename: str, max_pages=None, max_chars=None,
+                         deadline=None, enough=None):
+    # Returns (text, truncated). PDFs are read page by page and reading stops
+    # after ``max_pages`` pages, once ``max_chars`` characters are collected,
+    # at time.monotonic() ``deadline``, or as soon as ``enough(text)`` says
+    # the rest of the document is not needed. Other formats are decoded whole
+    # and only cut to ``max_chars``: the deadline is checked between PDF pages
+    # only, and a .docx is bounded by MAX_DOCX_XML_BYTES instead.
+    suffix = Path(filename).suffix.lower()
+    if suffix == '.pdf':
+        parts, chars, truncated = [], 0, False
+        pages = pdf_pages(data, max_pages + 1 if max_pages else None)
+        for n, page in enumerate(pages, start=1):
+            if max_pages and n > max_pages:
+                truncated = True
+                break
+            parts.append(page)
+            chars += len(page)
+            if (max_chars and chars >= max_chars) or (deadline and time.monotonic() >= deadline):
+                truncated = True
+                break
+            if enough and enough(''.join(parts)):
+                break
+        text = ''.join(parts)
+    elif suffix == '.docx':
+        import docx2txt
+        check_docx(data)
+        text, truncated = docx2txt.process(io.BytesIO(data)), False
+    else:
+        try:
+            import textract
+        except ImportError:
+            raise UnsupportedFormat("unsupported format") from None
+        with resume_source(data, filename) as path:
+            text, truncated = textract.process(path).decode('utf-8', errors='ignore'), False
+    if max_chars and len(text) > max_chars:
+        return text[:max_chars], True
+    return text, truncated
+
+
+def parse_with_pyresparser(data: bytes, filename: str):
+    from pyresparser import ResumeParser
+    with resume_source(data, filename) as source:
+        parser = ResumeParser(source)
+        info = parser.get_extracted_data() or {}
+    # ResumeParser keeps the text it decoded on the instance; reuse it instead
+    # of running pdfminer/docx2txt over the same document a second time.
+    text = getattr(parser, '_ResumeParser__text_raw', None)
+    if text is None:
+        text = extract_text(data, filename)
+    return info, text
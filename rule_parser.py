@@ -0,0 +1,103 @@
+import re
+from pathlib import Path
+
+from job_matcher import BOUNDARY_CHARS, trie_pattern
+
+# Regex-only extraction of the fields parse_resume keeps (name, email, skills,
+# education), returning them in the same shape as pyresparser's
+# get_extracted_data() so either engine can feed parse_resume. No spaCy model
+# is loaded, so a parse costs roughly what decoding the document costs.
+
+# Optional skills list in pyresparser's skills.csv format (one comma-separated
+# row); when present it replaces SKILLS.
+SKILLS_FILE = "skills.csv"
+SKILLS = [
+    "python", "java", "javascript", "typescript", "c", "c++", "c#", "go", "ruby", "php",
+    "swift", "kotlin", "scala", "r", "matlab", "sql", "nosql", "mysql", "postgresql",
+    "mongodb", "redis", "html", "css", "react", "angular", "vue", "node.js", "django",
+    "flask", "spring", ".net", "rest", "graphql", "git", "linux", "docker", "kubernetes",
+    "aws", "azure", "gcp", "terraform", "jenkins", "ci/cd", "microservices",
+    "machine learning", "deep learning", "data analysis", "data science", "statistics",
+    "pandas", "numpy", "tensorflow", "pytorch", "spark", "hadoop", "excel", "tableau",
+    "power bi", "etl", "seo", "sem", "content marketing", "social media", "google analytics",
+    "crm", "salesforce", "negotiation", "lead generation", "business development",
+    "project management", "product management", "agile", "scrum", "jira", "ux", "ui",
+    "figma", "photoshop", "onboarding", "recruitment", "payroll", "employee relations",
+    "communication", "leadership", "accounting", "budgeting", "customer service",
+]
+
+# pyresparser reads the name off the first proper nouns of the document; the
+# same information sits in the first few non-empty lines.
+HEADER_LINES = 8
+NAME_MAX_WORDS = 4
+NOT_A_NAME = {
+    "resume", "curriculum", "vitae", "cv", "profile", "summary", "contact",
+    "personal", "details", "information", "objective", "page",
+}
+
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+NAME_WORD_RE = re.compile(r"[A-ZÀ-Þ][A-Za-zÀ-ÿ'\-]*\.?$")
+# Short degree abbreviations are matched case-sensitively so "me", "ms" or
+# "be" in running text are not mistaken for degrees.
+DEGREE_RE = re.compile(
+    r'(?<![\w.])(?:'
+    r'B\.?E\.?|M\.?E\.?|B\.?S\.?|M\.?S\.?|B\.?A\.?|M\.?A\.?|MBA|'
+    r'B\.?Sc\.?|M\.?Sc\.?|BSC|MSC|B\.?Tech|M\.?Tech|BTECH|MTECH|Ph\.?D\.?|'
+    r'SSC|HSC|CBSE|ICSE|'
+    r'(?i:bachelor|master|doctorate|diploma|associate degree)'
+    r')(?![\w])'
+)
+
+
+def load_skills(path=SKILLS_FILE, default=SKILLS) -> list:
+    p = Path(path)
+    if not p.exists():
+        return default
+    return [s.strip() for s in p.read_text(encoding='utf-8').split(',') if s.strip()]
+
+
+def skills_pattern(skills):
+    words = {' '.join(s.lower().split()) for s in skills}
+    return re.compile(
+        rf'(?<![{BOUNDARY_CHARS}])(?:{trie_pattern(words)})(?![{BOUNDARY_CHARS}])'
+    )
+
+
+SKILLS_RE = skills_pattern(load_skills())
+
+
+def extract_name(lines) -> str:
+    for line in lines[:HEADER_LINES]:
+        words = line.replace(',', ' ').split()
+        if not 2 <= len(words) <= NAME_MAX_WORDS:
+            continue
+        if {w.lower().strip('.:') for w in words} & NOT_A_NAME:
+            continue
+        if all(NAME_WORD_RE.match(w) for w in words):
+            return ' '.join(words)
+    return ''
+
+
+def extract_skills(text) -> list:
+    found = {' '.join(m.group(0).split()) for m in SKILLS_RE.finditer(text.lower())}
+    # pyresparser reports skills capitalised, e.g. "Python", "Power bi".
+    return sorted(s.capitalize() for s in found)
+
+
+def extract_education(lines) -> list:
+    entries = []
+    for line in lines:
+        if DEGREE_RE.search(line):
+            entries.append(' '.join(line.split()))
+    return entries
+
+
+def extract(text: str) -> dict:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    email = EMAIL_RE.search(text)
+    return {
+        'name': extract_name(lines),
+        'email': email.group(0) if email else '',
+        'skills': extract_skills(text),
+        'education': extract_education(lines),
+    }
@@ -1,4 +1,4 @@
 @echo off
 cd /d C:\Users\Lenovo\Desktop\rec_bot
 call .venv\Scripts\activate.bat
-python rec_bot_runner.py
+python gmail_to_sheet_with_cv.py --trigger || start "rec_bot" python gmail_to_sheet_with_cv.py --daemon
@@ -0,0 +1,55 @@
+import time
+
+from ratelimit import backoff_delay
+
+MIN_INTERVAL = 30
+MAX_INTERVAL = 900
+# Aim for about this many new applications per cycle: frequent enough that
+# acknowledgments go out quickly at peaks, rare enough not to poll an empty
+# inbox every few seconds.
+TARGET_PER_CYCLE = 5
+# Arrival-rate memory: after this many quiet seconds the estimated rate has
+# halved.
+RATE_HALF_LIFE = 3600
+BACKOFF_BASE = 60
+
+
+class AdaptiveScheduler:
+    # Picks the sleep before the next cycle from an exponentially weighted
+    # arrival rate. A cycle that left work behind polls again at the
+    # minimum interval; a cycle that hit rate limits backs off exponentially
+    # (with jitter) until one gets through.
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 target=TARGET_PER_CYCLE, half_life=RATE_HALF_LIFE):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target = target
+        self.half_life = half_life
+        self.rate = 0.0
+        self.backlog = False
+        self.throttled = 0
+        self.last = time.monotonic()
+
+    def record(self, arrived, backlog=False, throttled=False):
+        now = time.monotonic()
+        elapsed = max(1.0, now - self.last)
+        self.last = now
+        observed = arrived / elapsed
+        keep = 0.5 ** (elapsed / self.half_life)
+        # Jump straight up to a burst, but let the rate decay slowly, so one
+        # quiet cycle in the middle of a busy day does not stretch the sleep.
+        self.rate = max(observed, keep * self.rate + (1 - keep) * observed)
+        self.backlog = backlog
+        self.throttled = self.throttled + 1 if throttled else 0
+
+    def record_throttled(self):
+        self.throttled += 1
+
+    def next_delay(self) -> float:
+        if self.throttled:
+            return backoff_delay(self.throttled - 1, BACKOFF_BASE, self.max_interval)
+        if self.backlog:
+            return self.min_interval
+        if self.rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target / self.rate))
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def fake_bot(tmp_path, monkeypatch):
+    # The bot module wired to in-process fakes, with its state files in
+    # tmp_path. Yields (bot, gmail, drive, sheets).
+    import gmail_to_sheet_with_cv as bot
+    from benchmark import reset_bot
+    from fake_google import FakeClients, FakeDrive, FakeGmail, FakeSheets
+    from metrics import Metrics
+
+    monkeypatch.chdir(tmp_path)
+    gmail, drive, sheets = FakeGmail(), FakeDrive(), FakeSheets()
+    monkeypatch.setattr(bot, 'CLIENTS', FakeClients(gmail, drive, sheets))
+    monkeypatch.setattr(bot, 'METRICS', Metrics())
+    reset_bot(bot)
+    yield bot, gmail, drive, sheets
+    reset_bot(bot)
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+import coordination
+import gmail_to_sheet_with_cv as bot
+from applicant_index import ApplicantIndex
+from benchmark import make_corpus
+from coordination import Coordinator, LeaseLost
+from fake_google import FakeSheets
+from journal import Journal
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    c = Coordinator(tmp_path / 'coordination.db', lease_seconds=0.2)
+    c.register(['inbox'])
+    yield c
+    c.close()
+
+
+def test_two_owners_never_claim_the_same_message(coordinator):
+    assert coordinator.claim('inbox', 'w1', ['a', 'b']) == ['a', 'b']
+    assert coordinator.claim('inbox', 'w2', ['a', 'b', 'c']) == ['c']
+    # An owner may take its own claims again, e.g. on a retry.
+    assert coordinator.claim('inbox', 'w1', ['a', 'c']) == ['a']
+
+
+def test_lapsed_claims_and_leases_are_taken_over(coordinator):
+    assert coordinator.acquire('w1', ['inbox']) == 'inbox'
+    assert coordinator.acquire('w2', ['inbox']) is None
+    coordinator.claim('inbox', 'w1', ['a', 'b'])
+    coordinator.complete('inbox', ['a'])
+    time.sleep(0.3)
+
+    assert coordinator.acquire('w2', ['inbox']) == 'inbox'
+    assert not coordinator.renew('inbox', 'w1')
+    # Finished messages are never handed out again.
+    assert coordinator.claim('inbox', 'w2', ['a', 'b']) == ['b']
+
+
+def test_finished_claims_are_pruned(coordinator, monkeypatch):
+    coordinator.claim('inbox', 'w1', ['a', 'b'])
+    coordinator.complete('inbox', ['a'])
+    later = time.time() + coordination.CLAIM_RETENTION + 1
+    monkeypatch.setattr(coordination.time, 'time', lambda: later)
+    coordinator.claim('inbox', 'w1', ['c'])
+    coordinator.complete('inbox', ['c'])
+    remaining = coordinator.query("SELECT msg_id FROM claims ORDER BY msg_id")
+    assert [r[0] for r in remaining] == ['b', 'c']
+
+
+def test_lost_lease_stops_flush_journal(tmp_path, monkeypatch):
+    index, journal = ApplicantIndex(tmp_path / 'applicants.db'), Journal(tmp_path / 'journal.db')
+    sheet = FakeSheets([['MsgID']])
+    journal.record_ready('m1', ['m1'] + [''] * 12)
+    lost = threading.Event()
+    lost.set()
+    monkeypatch.setattr(bot, '_lease_lost', lost)
+    with pytest.raises(LeaseLost):
+        bot.flush_journal(sheet, index, journal)
+    assert sheet.rows == [['MsgID']]
+    assert journal.count('ready') == 1
+    index.close()
+    journal.close()
+
+
+def test_checkpoint_holds_while_another_worker_has_claims(fake_bot, coordinator, monkeypatch):
+    bot, gmail, _, sheets = fake_bot
+    monkeypatch.setattr(bot, 'COORDINATOR', coordinator)
+    monkeypatch.setattr(bot, 'MAILBOX', 'inbox')
+    monkeypatch.setattr(bot, 'WORKER_ID', 'w2')
+    for message in make_corpus(3, seed=5, pages=1, duplicate_rate=0):
+        gmail.deliver(message)
+    coordinator.claim('inbox', 'w1', [gmail.order[0]])
+
+    _, backlog, throttled = bot.run_once()
+    assert backlog and not throttled
+    assert coordinator.load_checkpoint('inbox') is None
+    assert len(sheets.rows) == 3
+
+    # w1 died without finishing; once its claim lapses w2 takes the message.
+    time.sleep(0.3)
+    bot.run_once()
+    assert coordinator.load_checkpoint('inbox') is not None
+    assert sorted(r[0] for r in sheets.rows[1:]) == sorted(gmail.order)
@@ -0,0 +1,11 @@
+from benchmark import make_corpus
+
+
+def test_rows_are_appended_in_listing_order(fake_bot, monkeypatch):
+    bot, gmail, _, sheets = fake_bot
+    monkeypatch.setattr(bot, 'PARSE_WORKERS', 4)
+    for message in make_corpus(30, seed=3, pages=1, duplicate_rate=0):
+        gmail.deliver(message)
+
+    bot.run_once()
+    assert [r[0] for r in sheets.rows[1:]] == gmail.order
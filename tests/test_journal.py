@@ -0,0 +1,79 @@
+import pytest
+
+import gmail_to_sheet_with_cv as bot
+from applicant_index import ApplicantIndex
+from fake_google import FakeSheets
+from journal import Journal
+
+HEADER = ['MsgID'] + [''] * 12
+
+
+def row(msg_id):
+    return [msg_id, 'a@example.com', 'CV', '', 'link', f'Name {msg_id}', f'{msg_id}@example.com',
+            '', '', 'General Application', '', '', 'Yes']
+
+
+@pytest.fixture
+def stores(tmp_path):
+    index, journal = ApplicantIndex(tmp_path / 'applicants.db'), Journal(tmp_path / 'journal.db')
+    yield index, journal
+    index.close()
+    journal.close()
+
+
+def sheet_ids(sheet):
+    return [r[0] for r in sheet.rows[1:]]
+
+
+def crash(*_args, **_kwargs):
+    raise KeyboardInterrupt
+
+
+def test_crash_before_append_is_resent(stores, monkeypatch):
+    index, journal = stores
+    sheet = FakeSheets([HEADER])
+    journal.record_ready('m1', row('m1'))
+    journal.record_ready('m2', row('m2'))
+    with monkeypatch.context() as m:
+        m.setattr(bot, 'append_rows', crash)
+        with pytest.raises(KeyboardInterrupt):
+            bot.flush_journal(sheet, index, journal)
+    assert journal.appending() == ['m1', 'm2']
+
+    bot.recover_journal(sheet, index, journal)
+    assert sheet_ids(sheet) == ['m1', 'm2']
+    assert index.row_of('m2') == 3
+    assert journal.count() == 0
+
+
+def test_crash_after_append_is_not_duplicated(stores, monkeypatch):
+    index, journal = stores
+    sheet = FakeSheets([HEADER])
+    journal.record_ready('m1', row('m1'))
+    with monkeypatch.context() as m:
+        m.setattr(index, 'add_rows', crash)
+        with pytest.raises(KeyboardInterrupt):
+            bot.flush_journal(sheet, index, journal)
+    assert sheet_ids(sheet) == ['m1']
+    assert index.seen_ids(['m1']) == set()
+
+    bot.recover_journal(sheet, index, journal)
+    assert sheet_ids(sheet) == ['m1']
+    assert index.row_of('m1') == 2
+    assert journal.count() == 0
+
+
+def test_replay_appends_ready_rows_once(stores):
+    index, journal = stores
+    sheet = FakeSheets([HEADER, row('m0')])
+    index.rebuild([row('m0')])
+    journal.record_ready('m1', row('m1'))
+    journal.record_ready('m2', row('m2'))
+    # A message journaled twice (re-fetched before the first flush) keeps one row.
+    journal.record_ready('m1', row('m1'))
+
+    bot.recover_journal(sheet, index, journal)
+    bot.recover_journal(sheet, index, journal)
+    assert sheet_ids(sheet) == ['m0', 'm1', 'm2']
+    assert [index.row_of(m) for m in ('m0', 'm1', 'm2')] == [2, 3, 4]
+    assert journal.count() == 0
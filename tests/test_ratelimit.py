@@ -0,0 +1,11 @@
+import time
+
+from ratelimit import TokenBucket
+
+
+def test_acquire_more_than_capacity_waits_for_a_full_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    bucket.acquire(2)
+    started = time.monotonic()
+    bucket.acquire(10)
+    assert 0.05 < time.monotonic() - started < 1